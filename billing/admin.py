@@ -5,5 +5,6 @@ from django.utils.html import format_html
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
-    list_display = ('id', 'transaction_id', 'phone_number', 'amount', 'status')
+    list_display = ('id', 'transaction_id', 'phone_number', 'amount', 'status', 'last_checked_at')
+    list_filter = ('status',)
     search_fields = ('transaction_id', 'amount')
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from billing.reconciliation import reconcile_batch
+
+
+class Command(BaseCommand):
+    help = "Checks stale pending transactions with the gateway and updates them and their orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--interval', type=float, default=30,
+                            help="Seconds to sleep when no transaction is stale.")
+        parser.add_argument('--once', action='store_true',
+                            help="Reconcile what is stale now and exit.")
+
+    def handle(self, *args, **options):
+        while True:
+            checked, changed = reconcile_batch(options['batch_size'])
+            if checked:
+                self.stdout.write(f"checked={checked} " + " ".join(
+                    f"{status}={count}" for status, count in changed.items()))
+            # A full batch means more may be waiting.
+            if checked < options['batch_size']:
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
@@ -0,0 +1,29 @@
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+
+from billing.tokens import BANK_TOKEN_REFRESH_MARGIN, refresh_token, token_remaining
+
+
+class Command(BaseCommand):
+    help = "Keeps the bank OAuth token refreshed ahead of expiry."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=30,
+                            help="Seconds between checks.")
+        parser.add_argument('--once', action='store_true',
+                            help="Refresh if needed and exit.")
+
+    def handle(self, *args, **options):
+        while True:
+            remaining = token_remaining()
+            if remaining is None or remaining < BANK_TOKEN_REFRESH_MARGIN + options['interval']:
+                try:
+                    if refresh_token():
+                        self.stdout.write("Bank access token refreshed.")
+                except requests.exceptions.RequestException as e:
+                    self.stderr.write(f"Error refreshing access token: {e}")
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -10,6 +10,11 @@ class Transaction(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=50)
     created_at = models.DateTimeField(auto_now_add=True)
+    # When reconcile_transactions last asked the gateway about it.
+    last_checked_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return self.transaction_id
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'last_checked_at'])]
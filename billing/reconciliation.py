@@ -0,0 +1,126 @@
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.db import transaction as db_transaction
+from django.db.models import F, Q
+from django.utils.timezone import now
+
+from billing.models import Transaction
+from billing.tokens import get_access_token
+from logs_bot.outbox import enqueue_message
+from prison_market.ledger import CANCELLED_PAYMENT_STATUS, release_order
+from prison_market.models import Order
+from prisunion import settings
+from prisunion.http import session
+
+
+logger = logging.getLogger(__name__)
+
+# A pending transaction is checked once it is this old, and again after the
+# same interval has passed since its last check.
+RECONCILE_STALE_AFTER = getattr(settings, 'RECONCILE_STALE_AFTER', 2 * 60)
+# Holds still pending at the gateway after this long are marked expired.
+RECONCILE_EXPIRE_AFTER = getattr(settings, 'RECONCILE_EXPIRE_AFTER', 60 * 60 * 24)
+RECONCILE_WORKERS = getattr(settings, 'RECONCILE_WORKERS', 8)
+RECONCILE_TIMEOUT = getattr(settings, 'RECONCILE_TIMEOUT', (3.05, 10))
+
+# Gateway status (lowercased) -> local status. Unknown statuses are ignored.
+GATEWAY_STATUSES = getattr(settings, 'GATEWAY_STATUSES', {
+    'completed': 'completed',
+    'success': 'completed',
+    'paid': 'completed',
+    'pending': 'pending',
+    'hold': 'pending',
+    'created': 'pending',
+    'failed': 'failed',
+    'error': 'failed',
+    'cancelled': 'cancelled',
+    'canceled': 'cancelled',
+    'reversed': 'cancelled',
+    'expired': 'expired',
+})
+
+
+def stale_pending(batch_size):
+    cutoff = now() - timedelta(seconds=RECONCILE_STALE_AFTER)
+    return list(
+        Transaction.objects.filter(status='pending', created_at__lte=cutoff)
+        .filter(Q(last_checked_at__isnull=True) | Q(last_checked_at__lte=cutoff))
+        .order_by(F('last_checked_at').asc(nulls_first=True), 'id')[:batch_size])
+
+
+def check_gateway_status(transaction_id, access_token):
+    """
+    :return: The local status for the gateway's answer, or None if the
+        gateway could not be asked or answered with an unknown status.
+    """
+    try:
+        response = session.get(
+            f"{settings.API_URL_CHECK_STATUS}/{transaction_id}",
+            headers={'Authorization': f'Bearer {access_token}'},
+            timeout=RECONCILE_TIMEOUT)
+        if response.status_code != 200:
+            logger.warning(f"Status check of {transaction_id} returned {response.status_code}")
+            return None
+        gateway_status = str(response.json().get('status', '')).lower()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.warning(f"Status check of {transaction_id} failed: {e}")
+        return None
+    return GATEWAY_STATUSES.get(gateway_status)
+
+
+def reconcile_batch(batch_size=100):
+    """
+    Asks the gateway about one batch of stale pending transactions,
+    concurrently, and records the results.
+
+    Each status change is a conditional ``status='pending'`` UPDATE of its
+    row, so a status written meanwhile (e.g. ``completed`` by
+    PayTransactionView) is never overwritten; the linked orders are updated,
+    and completed payments announced via the outbox, only when that UPDATE
+    changed the row.
+
+    :return: A ``(checked, changed)`` tuple, where ``changed`` is a dict of
+        new status -> number of transactions.
+    """
+    transactions = stale_pending(batch_size)
+    if not transactions:
+        return 0, {}
+
+    access_token = get_access_token()
+    with ThreadPoolExecutor(max_workers=RECONCILE_WORKERS) as pool:
+        statuses = list(pool.map(
+            lambda t: check_gateway_status(t.transaction_id, access_token), transactions))
+
+    checked_at = now()
+    expire_before = checked_at - timedelta(seconds=RECONCILE_EXPIRE_AFTER)
+    Transaction.objects.filter(pk__in=[t.pk for t in transactions]).update(
+        last_checked_at=checked_at)
+
+    changed = defaultdict(list)
+    for transaction, status in zip(transactions, statuses):
+        if status == 'pending' and transaction.created_at <= expire_before:
+            status = 'expired'
+        if not status or status == 'pending':
+            continue
+
+        with db_transaction.atomic():
+            updated = Transaction.objects.filter(
+                pk=transaction.pk, status='pending').update(status=status)
+            if updated != 1:
+                continue
+            orders = Order.objects.filter(transaction=transaction).exclude(payment_status=status)
+            if status == 'completed':
+                for order_id in orders.values_list('id', flat=True):
+                    enqueue_message('new_order', {'order_id': order_id})
+            elif status == CANCELLED_PAYMENT_STATUS:
+                # update() skips the signal that gives the daily allowance back.
+                for order in orders:
+                    release_order(order)
+            orders.update(payment_status=status)
+        changed[status].append(transaction.pk)
+
+    return len(transactions), {status: len(pks) for status, pks in changed.items()}
@@ -0,0 +1,129 @@
+import logging
+import threading
+import time
+
+import requests
+from django.core.cache import cache
+
+from prisunion import settings
+from prisunion.http import session
+from prisunion.locks import acquire_lock, release_lock
+
+
+logger = logging.getLogger(__name__)
+
+# Used when the bank omits expires_in.
+BANK_TOKEN_DEFAULT_TTL = getattr(settings, 'BANK_TOKEN_DEFAULT_TTL', 60 * 60)
+# Tokens are refreshed in the background once less than this many seconds remain.
+BANK_TOKEN_REFRESH_MARGIN = getattr(settings, 'BANK_TOKEN_REFRESH_MARGIN', 5 * 60)
+BANK_TOKEN_LOCK_TIMEOUT = getattr(settings, 'BANK_TOKEN_LOCK_TIMEOUT', 30)
+
+BANK_TOKEN_CACHE_KEY = 'bank_access_token'
+BANK_TOKEN_LOCK_KEY = 'bank_access_token:lock'
+
+
+def fetch_token():
+    """
+    Requests a new token from OAUTH_TOKEN_URL.
+
+    :return: A ``(token, expires_in)`` tuple.
+    """
+    response = session.post(
+        settings.OAUTH_TOKEN_URL,
+        headers={
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Authorization': f'Basic {settings.BASIC_AUTH}'
+        },
+        data={
+            'grant_type': 'password',
+            'username': settings.OAUTH_USERNAME,
+            'password': settings.OAUTH_PASSWORD
+        }
+    )
+    response.raise_for_status()  # Raise an exception for HTTP errors
+    data = response.json()
+    return data['access_token'], int(data.get('expires_in') or BANK_TOKEN_DEFAULT_TTL)
+
+
+def refresh_token():
+    """
+    Fetches and caches a new token, unless another process is already doing
+    so (only the holder of the cache lock talks to the bank).
+
+    :return: The new token, or None if the refresh is in flight elsewhere.
+    """
+    lock_token = acquire_lock(BANK_TOKEN_LOCK_KEY, BANK_TOKEN_LOCK_TIMEOUT)
+    if lock_token is None:
+        return None
+    try:
+        token, expires_in = fetch_token()
+        cache.set(BANK_TOKEN_CACHE_KEY, {
+            'token': token,
+            'expires_at': time.time() + expires_in,
+        }, timeout=expires_in)
+        return token
+    finally:
+        release_lock(BANK_TOKEN_LOCK_KEY, lock_token)
+
+
+background_refresh = threading.Lock()
+
+
+def refresh_in_background():
+    # At most one refresh thread per process; the cache lock covers the rest.
+    if not background_refresh.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            refresh_token()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error refreshing access token: {e}")
+        finally:
+            background_refresh.release()
+
+    threading.Thread(target=run, name='bank-token-refresh', daemon=True).start()
+
+
+def token_remaining():
+    """
+    :return: Seconds until the cached token expires, or None if there is none.
+    """
+    entry = cache.get(BANK_TOKEN_CACHE_KEY)
+    if entry is None:
+        return None
+    return entry['expires_at'] - time.time()
+
+
+def get_access_token():
+    """
+    Returns a valid bank access token.
+
+    A cached token close to expiry is still returned while a background
+    refresh replaces it, so requests only wait for the bank when there is no
+    valid token at all (e.g. a cold cache); then a single request fetches it
+    and concurrent ones wait for its result.
+    """
+    deadline = time.monotonic() + BANK_TOKEN_LOCK_TIMEOUT
+    while True:
+        entry = cache.get(BANK_TOKEN_CACHE_KEY)
+        if entry is not None:
+            remaining = entry['expires_at'] - time.time()
+            if remaining > 0:
+                if remaining < BANK_TOKEN_REFRESH_MARGIN:
+                    refresh_in_background()
+                return entry['token']
+
+        try:
+            token = refresh_token()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error fetching access token: {e}")
+            raise
+        if token is not None:
+            return token
+
+        if time.monotonic() >= deadline:
+            # The refresh holding the lock is stuck; fetch one ourselves.
+            token, _ = fetch_token()
+            return token
+        time.sleep(0.05)
@@ -1,9 +1,11 @@
 from django.urls import path
-from .views import CheckStatusView, PayHoldTransactionView, PayTransactionView
+from .views import CheckStatusView, PayHoldTransactionView, PayTransactionView, TransactionStatusView
 
 urlpatterns = [
     path('pay-hold/', PayHoldTransactionView.as_view(), name='pay-hold'),
     path('pay-transaction/', PayTransactionView.as_view(), name='pay-transaction'),
     path('check-status/<str:transaction_id>/',
          CheckStatusView.as_view(), name='check-status'),
+    path('status/<str:transaction_id>/',
+         TransactionStatusView.as_view(), name='transaction-status'),
 ]
@@ -3,14 +3,17 @@ from rest_framework.response import Response
 from rest_framework import status
 import hashlib
 import json
-import requests
 from requests.auth import HTTPBasicAuth
-from django.core.cache import cache
 from billing.serializers import TransactionSerializer
-from logs_bot.utils import notify_new_order
+from billing.tokens import get_access_token
+from django.db import transaction as db_transaction
+from django.utils.timezone import now
+from logs_bot.outbox import enqueue_message
+from prison_market.idempotency import idempotent
 from prison_market.models import Order
 from prison_market.utils import standardResponse
 from prisunion import settings
+from prisunion.http import session
 from .models import Transaction
 import logging
 from rest_framework import viewsets
@@ -26,34 +29,7 @@ class BasePaymentView(APIView):
     """
 
     def get_access_token(self):
-        access_token = cache.get('access_token')
-        if access_token is not None:
-            return access_token
-
-        try:
-            response = requests.post(
-                settings.OAUTH_TOKEN_URL,
-                headers={
-                    'Content-Type': 'application/x-www-form-urlencoded',
-                    'Authorization': f'Basic {settings.BASIC_AUTH}'
-                },
-                data={
-                    'grant_type': 'password',
-                    'username': settings.OAUTH_USERNAME,
-                    'password': settings.OAUTH_PASSWORD
-                }
-            )
-            response.raise_for_status()  # Raise an exception for HTTP errors
-            access_token = response.json().get('access_token')
-            # Default to 1 hour if not provided
-            expires_in = response.json().get('expires_in', 17560)
-
-            # Store the token in cache for the duration of the token's validity
-            cache.set('access_token', access_token, timeout=expires_in)
-            return access_token
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error fetching access token: {e}")
-            raise
+        return get_access_token()
 
     def generate_hash_key(self, *args):
         # Concatenate args into a single string, encode it to bytes, and hash it
@@ -62,6 +38,7 @@ class BasePaymentView(APIView):
 
 
 class PayHoldTransactionView(BasePaymentView):
+    @idempotent
     def post(self, request, *args, **kwargs):
         required_fields = ['pan', 'expire', 'amount', 'orderId']
         missing_fields = [
@@ -95,7 +72,7 @@ class PayHoldTransactionView(BasePaymentView):
             'Content-Type': 'application/json'
         }
 
-        response = requests.post(
+        response = session.post(
             settings.API_URL_HOLD, data=json.dumps(payload), headers=headers)
 
         if response.status_code == 200:
@@ -127,6 +104,7 @@ class PayHoldTransactionView(BasePaymentView):
 
 
 class PayTransactionView(BasePaymentView):
+    @idempotent
     def post(self, request, *args, **kwargs):
         required_fields = ['transactionId', 'smsCode']
         missing_fields = [
@@ -156,24 +134,27 @@ class PayTransactionView(BasePaymentView):
         }
 
         # Make the payment request to the OFB API
-        response = requests.post(
+        response = session.post(
             settings.API_URL_PAY, data=json.dumps(payload), headers=headers)
 
         if response.status_code == 200:
             response_data = response.json().get('data', {})
             phone = response_data.get('phone', '')
-            transaction = Transaction.objects.filter(
-                transaction_id=transaction_id).first()
-            if transaction:
-                transaction.status = "completed"
-                transaction.phone_number = phone
-                transaction.save()
-
-            order = Order.objects.filter(transaction=transaction).first()
-            if order:
-                order.payment_status = "completed"
-                order.save()
-                notify_new_order(order.id)
+            # The staff notification is written to the outbox in the same
+            # transaction and sent by the drain_outbox worker.
+            with db_transaction.atomic():
+                transaction = Transaction.objects.filter(
+                    transaction_id=transaction_id).first()
+                if transaction:
+                    transaction.status = "completed"
+                    transaction.phone_number = phone
+                    transaction.save()
+
+                    order = Order.objects.filter(transaction=transaction).first()
+                    if order:
+                        order.payment_status = "completed"
+                        order.save()
+                        enqueue_message('new_order', {'order_id': order.id})
 
             # Returning a successful response
             return Response({
@@ -200,17 +181,37 @@ class CheckStatusView(BasePaymentView):
 
         url = f"{settings.API_URL_CHECK_STATUS}/{transaction_id}"
 
-        response = requests.get(url, headers=headers)
+        response = session.get(url, headers=headers)
 
         if response.status_code == 200:
             # Optionally update the transaction status in the database
             Transaction.objects.filter(transaction_id=transaction_id).update(
-                status=response.json().get('status', 'Unknown')
+                status=response.json().get('status', 'Unknown'),
+                last_checked_at=now()
             )
 
         return Response(response.json(), status=response.status_code)
 
 
+class TransactionStatusView(APIView):
+    """
+    The locally stored status, kept current by reconcile_transactions, so
+    clients can poll without a round trip to the bank.
+    """
+
+    def get(self, request, transaction_id, *args, **kwargs):
+        transaction = Transaction.objects.filter(
+            transaction_id=transaction_id).only('status', 'last_checked_at').first()
+        if transaction is None:
+            return Response({'errorMessage': 'Transaction not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            'transactionId': transaction_id,
+            'status': transaction.status,
+            'lastCheckedAt': transaction.last_checked_at,
+        }, status=status.HTTP_200_OK)
+
+
 class TransactionView(viewsets.ReadOnlyModelViewSet):
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
@@ -0,0 +1,16 @@
+"""
+Local stand-ins for the external APIs the backend calls, for load tests and
+offline development. Standard library only; run with::
+
+    python -m gateway_simulator --port 8900 --latency 80 --error-rate 0.01
+
+and point the settings at it (the startup banner prints the values)::
+
+    OAUTH_TOKEN_URL = 'http://127.0.0.1:8900/ofb/oauth/token'
+    API_URL_HOLD = 'http://127.0.0.1:8900/ofb/payment/hold'
+    API_URL_PAY = 'http://127.0.0.1:8900/ofb/payment/pay'
+    API_URL_CHECK_STATUS = 'http://127.0.0.1:8900/ofb/payment/status'
+    ESKIZ_API_URL = 'http://127.0.0.1:8900/eskiz/api'
+    ONE_SIGNAL_NOTIFICATION_URL = 'http://127.0.0.1:8900/onesignal/api/v1/notifications'
+    TELEGRAM_API_BASE_URL = 'http://127.0.0.1:8900/telegram'
+"""
@@ -0,0 +1,62 @@
+import argparse
+
+from gateway_simulator.server import SimulatorConfig, SimulatorServer, settings_for
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m gateway_simulator',
+        description="Simulates the OFB, Eskiz, OneSignal and Telegram APIs.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=0,
+                        help="Mean added latency per request, in milliseconds.")
+    parser.add_argument('--jitter', type=float, default=0,
+                        help="Uniform +/- jitter around the latency, in milliseconds.")
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="Fraction of requests answered with a 500.")
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                        help="Fraction of requests answered with a 429.")
+    parser.add_argument('--retry-after', type=int, default=1,
+                        help="retry_after seconds sent with 429 responses.")
+    parser.add_argument('--no-telegram-limits', action='store_true',
+                        help="Do not enforce Telegram's per-chat and global rate limits.")
+    parser.add_argument('--payment-delay', type=float, default=0,
+                        help="Seconds a paid transaction stays pending on the status endpoint.")
+    parser.add_argument('--eskiz-token-ttl', type=float, default=30 * 24 * 60 * 60,
+                        help="Seconds an Eskiz token is accepted before 401s.")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="Random seed for reproducible fault injection.")
+    parser.add_argument('--verbose', action='store_true', help="Log every request.")
+    args = parser.parse_args()
+
+    config = SimulatorConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        telegram_limits=not args.no_telegram_limits,
+        payment_delay=args.payment_delay,
+        eskiz_token_ttl=args.eskiz_token_ttl,
+        seed=args.seed,
+    )
+    server = SimulatorServer((args.host, args.port), config, verbose=args.verbose)
+    base_url = f'http://{args.host}:{server.server_port}'
+
+    print(f"Gateway simulator listening on {base_url}")
+    print("Point the settings at it with:")
+    for name, value in settings_for(base_url).items():
+        print(f"    {name} = '{value}'")
+    print(f"Request counters: {base_url}/_stats")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,357 @@
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class SimulatorConfig:
+    """
+    Fault injection knobs, shared by every simulated API.
+
+    :param latency: Mean added latency in milliseconds.
+    :param jitter: Uniform +/- jitter around ``latency`` in milliseconds.
+    :param error_rate: Fraction of requests answered with a 500.
+    :param throttle_rate: Fraction of requests answered with a 429.
+    :param retry_after: ``retry_after`` seconds sent with 429s.
+    :param telegram_limits: Enforce Telegram's per-chat and global limits.
+    :param payment_delay: Seconds a paid transaction reports ``pending``
+        from the status endpoint before ``completed``.
+    :param eskiz_token_ttl: Seconds an Eskiz token is accepted.
+    :param onesignal_chunk: Maximum external user IDs per OneSignal request.
+    """
+
+    def __init__(self, latency=0, jitter=0, error_rate=0.0, throttle_rate=0.0,
+                 retry_after=1, telegram_limits=True, payment_delay=0,
+                 eskiz_token_ttl=30 * 24 * 60 * 60, onesignal_chunk=2000, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.telegram_limits = telegram_limits
+        self.payment_delay = payment_delay
+        self.eskiz_token_ttl = eskiz_token_ttl
+        self.onesignal_chunk = onesignal_chunk
+        self.random = random.Random(seed)
+
+
+class SimulatorState:
+    """
+    In-memory state of the simulated services.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bank_tokens = set()
+        self.transactions = {}
+        self.eskiz_tokens = {}
+        self.telegram_message_id = 0
+        self.telegram_chat_sends = {}
+        self.telegram_recent = deque()
+        self.requests = Counter()
+        self.statuses = Counter()
+
+
+class SimulatorHandler(BaseHTTPRequestHandler):
+    server_version = 'GatewaySimulator/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    routes = [
+        ('POST', re.compile(r'^/ofb/oauth/token$'), 'ofb_token'),
+        ('POST', re.compile(r'^/ofb/payment/hold$'), 'ofb_hold'),
+        ('POST', re.compile(r'^/ofb/payment/pay$'), 'ofb_pay'),
+        ('GET', re.compile(r'^/ofb/payment/status/(?P<transaction_id>[^/]+)$'), 'ofb_status'),
+        ('POST', re.compile(r'^/eskiz/api/auth/login$'), 'eskiz_login'),
+        ('POST', re.compile(r'^/eskiz/api/message/sms/send$'), 'eskiz_send'),
+        ('POST', re.compile(r'^/onesignal/api/v1/notifications$'), 'onesignal_notify'),
+        ('POST', re.compile(r'^/telegram/bot(?P<token>[^/]+)/(?P<method>\w+)$'), 'telegram'),
+        ('GET', re.compile(r'^/telegram/bot(?P<token>[^/]+)/(?P<method>\w+)$'), 'telegram'),
+        ('GET', re.compile(r'^/_stats$'), 'stats'),
+    ]
+
+    @property
+    def config(self):
+        return self.server.config
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def dispatch(self, method):
+        url = urlsplit(self.path)
+        self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self.body = self.read_body()
+
+        for route_method, pattern, name in self.routes:
+            match = pattern.match(url.path)
+            if route_method == method and match:
+                break
+        else:
+            return self.respond(404, {'error': f'No simulated endpoint for {method} {url.path}'})
+
+        with self.state.lock:
+            self.state.requests[name] += 1
+
+        if name != 'stats':
+            self.delay()
+            fault = self.fault(name)
+            if fault:
+                return self.respond(*fault)
+
+        status, payload = getattr(self, name)(**match.groupdict())
+        self.respond(status, payload)
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        if not raw:
+            return {}
+        if 'json' in (self.headers.get('Content-Type') or ''):
+            try:
+                return json.loads(raw)
+            except ValueError:
+                return {}
+        return {key: values[-1] for key, values in parse_qs(raw.decode()).items()}
+
+    def respond(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        with self.state.lock:
+            self.state.statuses[status] += 1
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def delay(self):
+        latency = self.config.latency + self.config.random.uniform(
+            -self.config.jitter, self.config.jitter)
+        if latency > 0:
+            time.sleep(latency / 1000)
+
+    def fault(self, name):
+        roll = self.config.random.random()
+        if roll < self.config.error_rate:
+            if name == 'telegram':
+                return 500, {'ok': False, 'error_code': 500, 'description': 'Internal Server Error'}
+            return 500, {'errorMessage': 'Simulated gateway error'}
+        if roll < self.config.error_rate + self.config.throttle_rate:
+            return self.throttled(name)
+        return None
+
+    def throttled(self, name):
+        retry_after = self.config.retry_after
+        if name == 'telegram':
+            payload = {
+                'ok': False, 'error_code': 429,
+                'description': f'Too Many Requests: retry after {retry_after}',
+                'parameters': {'retry_after': retry_after},
+            }
+        elif name == 'onesignal_notify':
+            payload = {'errors': ['API rate limit exceeded']}
+        else:
+            payload = {'errorMessage': 'Too many requests'}
+        return 429, payload, {'Retry-After': str(retry_after)}
+
+    def bearer(self):
+        authorization = self.headers.get('Authorization') or ''
+        return authorization[7:] if authorization.startswith('Bearer ') else None
+
+    # OFB payment gateway
+
+    def ofb_token(self):
+        if self.body.get('grant_type') != 'password':
+            return 400, {'error': 'unsupported_grant_type'}
+        token = uuid.uuid4().hex
+        with self.state.lock:
+            self.state.bank_tokens.add(token)
+        return 200, {'access_token': token, 'token_type': 'bearer', 'expires_in': 3600}
+
+    def ofb_hold(self):
+        if self.bearer() not in self.state.bank_tokens:
+            return 401, {'errorMessage': 'Unauthorized'}
+        missing = [field for field in ('pan', 'expire', 'amount', 'hashKey') if not self.body.get(field)]
+        if missing:
+            return 400, {'errorMessage': f"Missing fields: {', '.join(missing)}"}
+        transaction_id = str(uuid.uuid4())
+        phone = '99890***' + str(self.body['pan'])[-4:]
+        with self.state.lock:
+            self.state.transactions[transaction_id] = {
+                'status': 'hold', 'phone': phone, 'amount': self.body['amount'], 'paid_at': None,
+            }
+        return 200, {'data': {'transactionId': transaction_id, 'phone': phone}}
+
+    def ofb_pay(self):
+        if self.bearer() not in self.state.bank_tokens:
+            return 401, {'errorMessage': 'Unauthorized'}
+        transaction = self.state.transactions.get(self.body.get('transactionId'))
+        if transaction is None:
+            return 404, {'errorMessage': 'Transaction not found'}
+        if not self.body.get('smsCode') or not self.body.get('hashKey'):
+            return 400, {'errorMessage': 'Missing fields: smsCode, hashKey'}
+        with self.state.lock:
+            transaction['status'] = 'paid'
+            transaction['paid_at'] = time.monotonic()
+        transaction_id = self.body['transactionId']
+        return 200, {'data': {
+            'transactionId': transaction_id,
+            'phone': transaction['phone'],
+            'qrCodeUrl': f'http://{self.headers.get("Host")}/ofb/receipt/{transaction_id}',
+        }}
+
+    def ofb_status(self, transaction_id):
+        if self.bearer() not in self.state.bank_tokens:
+            return 401, {'errorMessage': 'Unauthorized'}
+        transaction = self.state.transactions.get(transaction_id)
+        if transaction is None:
+            return 404, {'errorMessage': 'Transaction not found'}
+        status = 'pending'
+        if transaction['paid_at'] is not None and \
+                time.monotonic() - transaction['paid_at'] >= self.config.payment_delay:
+            status = 'completed'
+        return 200, {'transactionId': transaction_id, 'status': status, 'amount': transaction['amount']}
+
+    # Eskiz SMS
+
+    def eskiz_login(self):
+        if not self.body.get('email') or not self.body.get('password'):
+            return 401, {'message': 'Invalid credentials'}
+        token = uuid.uuid4().hex
+        with self.state.lock:
+            self.state.eskiz_tokens[token] = time.monotonic() + self.config.eskiz_token_ttl
+        return 200, {'message': 'token_generated', 'data': {'token': token}, 'token_type': 'bearer'}
+
+    def eskiz_send(self):
+        expires_at = self.state.eskiz_tokens.get(self.bearer())
+        if expires_at is None or expires_at < time.monotonic():
+            return 401, {'status': 'token-invalid', 'message': 'Expired'}
+        if not self.body.get('mobile_phone') or not self.body.get('message'):
+            return 422, {'status': 'error', 'message': 'mobile_phone and message are required'}
+        return 200, {'id': uuid.uuid4().hex, 'status': 'waiting', 'message': 'Waiting for SMS provider'}
+
+    # OneSignal
+
+    def onesignal_notify(self):
+        if not (self.headers.get('Authorization') or '').startswith('Basic '):
+            return 403, {'errors': ['Please include a case-sensitive header of Authorization: Basic <YOUR-REST-API-KEY-HERE>']}
+        if not self.body.get('app_id'):
+            return 400, {'errors': ['app_id not found']}
+        external_ids = self.body.get('include_external_user_ids')
+        if external_ids is not None:
+            if len(external_ids) > self.config.onesignal_chunk:
+                return 400, {'errors': [f'You may only specify up to {self.config.onesignal_chunk} external user ids']}
+            recipients = len(external_ids)
+        elif self.body.get('included_segments'):
+            recipients = 1000
+        else:
+            return 400, {'errors': ['You must include which players, segments, or tags you wish to send this notification to.']}
+        return 200, {'id': str(uuid.uuid4()), 'recipients': recipients, 'external_id': None}
+
+    # Telegram Bot API
+
+    def telegram_throttle(self, chat_id):
+        """
+        :return: Seconds to wait if the send would exceed Telegram's limits.
+        """
+        if not self.config.telegram_limits or chat_id is None:
+            return 0
+        now = time.monotonic()
+        # Groups allow 20 messages per minute, private chats about one per second.
+        interval = 3 if str(chat_id).startswith('-') else 1
+        with self.state.lock:
+            recent = self.state.telegram_recent
+            while recent and now - recent[0] >= 1:
+                recent.popleft()
+            last = self.state.telegram_chat_sends.get(chat_id)
+            # Allow a little slack for clock granularity on the client.
+            if last is not None and now - last < interval * 0.9:
+                return max(1, round(interval - (now - last)))
+            if len(recent) >= 30:
+                return 1
+            self.state.telegram_chat_sends[chat_id] = now
+            recent.append(now)
+        return 0
+
+    def telegram(self, token, method):
+        params = dict(self.query, **self.body)
+        if method in ('setWebhook', 'deleteWebhook'):
+            return 200, {'ok': True, 'result': True, 'description': 'Webhook was set'}
+        if method == 'getMe':
+            return 200, {'ok': True, 'result': {'id': 1, 'is_bot': True, 'username': 'simulator_bot'}}
+        if method not in ('sendMessage', 'editMessageText'):
+            return 404, {'ok': False, 'error_code': 404, 'description': 'Not Found: method not found'}
+
+        chat_id = params.get('chat_id')
+        if not chat_id or not params.get('text'):
+            return 400, {'ok': False, 'error_code': 400, 'description': 'Bad Request: message text is empty'}
+
+        retry_after = self.telegram_throttle(chat_id)
+        if retry_after:
+            return 429, {
+                'ok': False, 'error_code': 429,
+                'description': f'Too Many Requests: retry after {retry_after}',
+                'parameters': {'retry_after': retry_after},
+            }
+
+        if method == 'editMessageText':
+            message_id = int(params.get('message_id') or 0)
+        else:
+            with self.state.lock:
+                self.state.telegram_message_id += 1
+                message_id = self.state.telegram_message_id
+        return 200, {'ok': True, 'result': {
+            'message_id': message_id,
+            'chat': {'id': int(chat_id)},
+            'date': int(time.time()),
+            'text': params['text'],
+        }}
+
+    def stats(self):
+        with self.state.lock:
+            return 200, {
+                'requests': dict(self.state.requests),
+                'statuses': {str(status): count for status, count in self.state.statuses.items()},
+                'transactions': len(self.state.transactions),
+            }
+
+
+class SimulatorServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config=None, verbose=False):
+        super().__init__(address, SimulatorHandler)
+        self.config = config or SimulatorConfig()
+        self.state = SimulatorState()
+        self.verbose = verbose
+
+
+def settings_for(base_url):
+    """
+    The settings that point the backend at a simulator running at ``base_url``.
+    """
+    return {
+        'OAUTH_TOKEN_URL': f'{base_url}/ofb/oauth/token',
+        'API_URL_HOLD': f'{base_url}/ofb/payment/hold',
+        'API_URL_PAY': f'{base_url}/ofb/payment/pay',
+        'API_URL_CHECK_STATUS': f'{base_url}/ofb/payment/status',
+        'ESKIZ_API_URL': f'{base_url}/eskiz/api',
+        'ONE_SIGNAL_NOTIFICATION_URL': f'{base_url}/onesignal/api/v1/notifications',
+        'TELEGRAM_API_BASE_URL': f'{base_url}/telegram',
+    }
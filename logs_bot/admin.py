@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from logs_bot.models import TelegramUser
+from logs_bot.models import OutboxMessage, TelegramUpdate, TelegramUser
 
 
 @admin.register(TelegramUser)
@@ -8,3 +8,18 @@ class TelegramUserAdmin(admin.ModelAdmin):
     list_display = ('username', 'chat_id', 'registered_on')
     search_fields = ('username', 'chat_id')
     list_filter = ('registered_on',)
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('id', 'topic', 'status', 'attempts',
+                    'available_at', 'created_at', 'sent_at')
+    list_filter = ('topic', 'status')
+    search_fields = ('last_error',)
+
+
+@admin.register(TelegramUpdate)
+class TelegramUpdateAdmin(admin.ModelAdmin):
+    list_display = ('update_id', 'received_at', 'processed_at', 'attempts')
+    list_filter = ('processed_at',)
+    search_fields = ('update_id', 'last_error')
@@ -1,5 +1,9 @@
+from django.conf import settings
+
 TELEGRAM_BOT_TOKEN = '7133386564:AAGArczpPXbyy7aFI6rydZf55PDrvR8-iJY'
-TELEGRAM_API_URL = f'https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}'
+# Overridable so the bot can be pointed at the gateway simulator.
+TELEGRAM_API_BASE_URL = getattr(settings, 'TELEGRAM_API_BASE_URL', 'https://api.telegram.org')
+TELEGRAM_API_URL = f'{TELEGRAM_API_BASE_URL}/bot{TELEGRAM_BOT_TOKEN}'
 URL = "https://29295da11a423aaedff0950d95c77392.serveo.net/webhook/"
 PRISUNION_ERRORS_ID = -4194749196
 PRISUNION_STORE_ID = -4194749196
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from logs_bot.outbox import drain
+
+
+class Command(BaseCommand):
+    help = "Delivers pending outbox messages in batches, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="Seconds to sleep when the outbox is empty.")
+        parser.add_argument('--once', action='store_true',
+                            help="Drain the due messages and exit.")
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = drain(options['batch_size'])
+            if sent or failed:
+                self.stdout.write(f"sent={sent} failed={failed}")
+            if sent + failed < options['batch_size']:
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
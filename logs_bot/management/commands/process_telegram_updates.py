@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from logs_bot.sender import sender
+from logs_bot.updates import process_pending_updates
+
+
+class Command(BaseCommand):
+    help = "Handles Telegram updates stored by the webhook, in update_id order."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--interval', type=float, default=0.5,
+                            help="Seconds to sleep when there is nothing to handle.")
+        parser.add_argument('--once', action='store_true',
+                            help="Handle the stored updates and exit.")
+
+    def handle(self, *args, **options):
+        while True:
+            handled = process_pending_updates(options['batch_size'])
+            # Replies are queued by the sender; let them go out before the next batch.
+            sender.flush()
+            if handled:
+                self.stdout.write(f"handled={handled}")
+            if handled < options['batch_size']:
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
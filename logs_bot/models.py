@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils.timezone import now
 
 
 class TelegramUser(models.Model):
@@ -8,3 +9,52 @@ class TelegramUser(models.Model):
 
     def __str__(self):
         return self.username
+
+
+class OutboxMessage(models.Model):
+    """
+    A side effect (e.g. a Telegram notification) written in the same
+    transaction as the change that causes it, and delivered later by the
+    ``drain_outbox`` worker.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(
+        default=now, help_text="The message is not delivered before this time.")
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.topic} #{self.id} ({self.status})"
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'available_at'])]
+
+
+class TelegramUpdate(models.Model):
+    """
+    A raw update received by the webhook. Updates are acknowledged as soon as
+    they are stored and handled by the ``process_telegram_updates`` worker in
+    ``update_id`` order. The unique ``update_id`` drops Telegram's retries.
+    """
+    update_id = models.BigIntegerField(unique=True)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"Update {self.update_id}"
+
+    class Meta:
+        indexes = [models.Index(fields=['processed_at', 'update_id'])]
@@ -0,0 +1,105 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import now
+
+from logs_bot.models import OutboxMessage
+from logs_bot.utils import notify_new_order
+
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)
+OUTBOX_BACKOFF_BASE = getattr(settings, 'OUTBOX_BACKOFF_BASE', 5)
+OUTBOX_BACKOFF_MAX = getattr(settings, 'OUTBOX_BACKOFF_MAX', 60 * 60)
+# A claimed message is hidden from other workers for this many seconds.
+OUTBOX_LEASE = getattr(settings, 'OUTBOX_LEASE', 5 * 60)
+
+HANDLERS = {}
+
+
+class OutboxDeliveryError(Exception):
+    pass
+
+
+def outbox_handler(topic):
+    """
+    Registers a function delivering the messages of ``topic``. It is called
+    with the message payload and raises to have the delivery retried.
+    """
+    def register(handler):
+        HANDLERS[topic] = handler
+        return handler
+    return register
+
+
+def enqueue_message(topic, payload):
+    """
+    Adds a message to the outbox. Call it inside the transaction that makes
+    the change, so the message is committed (or rolled back) with it.
+    """
+    return OutboxMessage.objects.create(topic=topic, payload=payload)
+
+
+def claim_batch(batch_size):
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', available_at__lte=now())
+            .order_by('id')[:batch_size])
+        if messages:
+            OutboxMessage.objects.filter(pk__in=[m.pk for m in messages]).update(
+                available_at=now() + timedelta(seconds=OUTBOX_LEASE))
+    return messages
+
+
+def backoff(attempts):
+    return min(OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX)
+
+
+def deliver(message):
+    handler = HANDLERS.get(message.topic)
+    message.attempts += 1
+    try:
+        if handler is None:
+            raise OutboxDeliveryError(f"No handler for topic {message.topic}")
+        handler(message.payload)
+    except Exception as e:
+        logger.warning(f"Outbox message {message.id} ({message.topic}) failed: {e}")
+        message.last_error = str(e)
+        if message.attempts >= OUTBOX_MAX_ATTEMPTS:
+            message.status = 'failed'
+        else:
+            message.available_at = now() + timedelta(seconds=backoff(message.attempts))
+        message.save(update_fields=['attempts', 'last_error', 'status', 'available_at'])
+        return False
+
+    message.status = 'sent'
+    message.sent_at = now()
+    message.last_error = ''
+    message.save(update_fields=['attempts', 'last_error', 'status', 'sent_at'])
+    return True
+
+
+def drain(batch_size=50):
+    """
+    Delivers one batch of due messages.
+
+    :return: A ``(sent, failed)`` tuple of counts.
+    """
+    sent = failed = 0
+    for message in claim_batch(batch_size):
+        if deliver(message):
+            sent += 1
+        else:
+            failed += 1
+    return sent, failed
+
+
+@outbox_handler('new_order')
+def deliver_new_order(payload):
+    result = notify_new_order(payload['order_id'])
+    if result is not None and not result.get('ok'):
+        raise OutboxDeliveryError(result.get('description', 'Telegram rejected the message'))
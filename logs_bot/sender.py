@@ -0,0 +1,270 @@
+import atexit
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, Future
+
+from django.conf import settings
+from django.core.cache import cache
+
+from logs_bot.credentials import TELEGRAM_API_URL
+from prisunion.http import session as http_session
+
+
+logger = logging.getLogger(__name__)
+
+# Telegram allows about 30 messages per second overall, one message per
+# second in a private chat and 20 messages per minute in a group.
+TELEGRAM_GLOBAL_RATE = getattr(settings, 'TELEGRAM_GLOBAL_RATE', 30)
+TELEGRAM_CHAT_INTERVAL = getattr(settings, 'TELEGRAM_CHAT_INTERVAL', 1.0)
+TELEGRAM_GROUP_INTERVAL = getattr(settings, 'TELEGRAM_GROUP_INTERVAL', 3.0)
+TELEGRAM_TIMEOUT = getattr(settings, 'TELEGRAM_TIMEOUT', (3.05, 10))
+TELEGRAM_MAX_RETRIES = getattr(settings, 'TELEGRAM_MAX_RETRIES', 3)
+# How long request() waits for a queued request to be sent and answered.
+TELEGRAM_REQUEST_TIMEOUT = getattr(settings, 'TELEGRAM_REQUEST_TIMEOUT', 60)
+
+TELEGRAM_CHAT_SLOT_KEY = 'telegram:chat_slot'
+TELEGRAM_GLOBAL_SLOT_KEY = 'telegram:global_slot'
+
+
+class TelegramSender:
+    """
+    Sends Bot API requests over the shared keep-alive session, paced per chat and
+    globally so bursts stay under Telegram's limits.
+
+    Requests are queued per chat and sent by a background thread. Every send
+    claims a slot in the shared cache first, so the limits hold for all
+    processes and servers using the bot together. A 429 pauses the chat for
+    the ``retry_after`` Telegram asks for, everywhere, and the request is sent
+    again. Requests queued with the same ``coalesce_key`` (e.g. edits of one
+    message) replace each other while waiting, so only the latest is sent.
+    """
+
+    def __init__(self, api_url=TELEGRAM_API_URL, session=None):
+        self.api_url = api_url
+        self.session = session or http_session
+        self.condition = threading.Condition()
+        # chat_id -> OrderedDict of key -> [method, payload, future, attempts]
+        self.queues = {}
+        self.next_chat_send = {}
+        self.recent_sends = deque()
+        self.in_flight = 0
+        self.thread = None
+        self.sequence = 0
+
+    def submit(self, method, payload, coalesce_key=None):
+        """
+        Queues a Bot API request.
+
+        :param method: Bot API method, e.g. ``sendMessage``.
+        :param payload: Request parameters, including ``chat_id``.
+        :param coalesce_key: Requests with the same key that are still queued
+            are replaced by this one.
+        :return: A Future that resolves to the decoded Telegram response.
+        """
+        chat_id = payload['chat_id']
+        with self.condition:
+            queue = self.queues.setdefault(chat_id, OrderedDict())
+            pending = queue.get(coalesce_key) if coalesce_key else None
+            if pending is not None and not pending[2].cancelled():
+                # Superseded callers get the result of the request that is sent.
+                pending[0], pending[1] = method, payload
+                return pending[2]
+
+            future = Future()
+            if coalesce_key is None:
+                self.sequence += 1
+                key = ('seq', self.sequence)
+            else:
+                key = coalesce_key
+            queue[key] = [method, payload, future, 0]
+            self.start()
+            self.condition.notify_all()
+            return future
+
+    def request(self, method, payload, coalesce_key=None, timeout=TELEGRAM_REQUEST_TIMEOUT):
+        """
+        Queues a request and waits for its response.
+
+        :raises TimeoutError: If there is no response within ``timeout``
+            seconds. A request that has not been sent yet is dropped, so the
+            caller can retry it without sending it twice.
+        """
+        future = self.submit(method, payload, coalesce_key)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def flush(self, timeout=None):
+        """
+        Waits until every queued request has been sent.
+
+        :return: True if the queues drained before the timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while any(self.queues.values()) or self.in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(
+                target=self.run, name='telegram-sender', daemon=True)
+            self.thread.start()
+
+    def chat_interval(self, chat_id):
+        # Group and channel IDs are negative.
+        return TELEGRAM_GROUP_INTERVAL if str(chat_id).startswith('-') else TELEGRAM_CHAT_INTERVAL
+
+    def claim_slot(self, chat_id):
+        """
+        Claims the chat's and the global send slot in the shared cache.
+
+        :return: 0 if claimed, otherwise the seconds to wait before trying again.
+        """
+        interval = self.chat_interval(chat_id)
+        if not cache.add(f"{TELEGRAM_CHAT_SLOT_KEY}:{chat_id}", 1, timeout=math.ceil(interval)):
+            return interval
+
+        window = int(time.time())
+        key = f"{TELEGRAM_GLOBAL_SLOT_KEY}:{window}"
+        cache.add(key, 0, timeout=2)
+        try:
+            sends = cache.incr(key)
+        except ValueError:
+            # The window's counter expired in between.
+            sends = 1
+        if sends > TELEGRAM_GLOBAL_RATE:
+            return window + 1 - time.time()
+        return 0
+
+    def pause_chat(self, chat_id, seconds):
+        cache.set(f"{TELEGRAM_CHAT_SLOT_KEY}:{chat_id}", 1, timeout=math.ceil(seconds))
+
+    def next_request(self):
+        """
+        Picks the chat that may send the soonest, going by this process's
+        own sends. Must hold the condition.
+
+        :return: (delay, chat_id), or (None, None) if nothing is queued.
+        """
+        now = time.monotonic()
+        while self.recent_sends and now - self.recent_sends[0] >= 1:
+            self.recent_sends.popleft()
+        global_wait = 0
+        if len(self.recent_sends) >= TELEGRAM_GLOBAL_RATE:
+            global_wait = 1 - (now - self.recent_sends[0])
+
+        best = None
+        for chat_id, queue in self.queues.items():
+            if not queue:
+                continue
+            wait = max(self.next_chat_send.get(chat_id, 0) - now, global_wait, 0)
+            if best is None or wait < best[0]:
+                best = (wait, chat_id)
+        return best or (None, None)
+
+    def run(self):
+        while True:
+            with self.condition:
+                delay, chat_id = self.next_request()
+                while delay is None or delay > 0:
+                    self.condition.wait(delay)
+                    delay, chat_id = self.next_request()
+
+                queue = self.queues[chat_id]
+                key, entry = next(iter(queue.items()))
+                if entry[3] == 0 and entry[2].cancelled():
+                    # request() gave up waiting for it.
+                    del queue[key]
+                    if not queue:
+                        del self.queues[chat_id]
+                    self.condition.notify_all()
+                    continue
+
+                wait = self.claim_slot(chat_id)
+                now = time.monotonic()
+                if wait:
+                    # Another process sent to this chat or used up the global rate.
+                    self.next_chat_send[chat_id] = now + wait
+                    continue
+
+                del queue[key]
+                if not queue:
+                    del self.queues[chat_id]
+                if entry[3] == 0 and not entry[2].set_running_or_notify_cancel():
+                    self.condition.notify_all()
+                    continue
+                self.recent_sends.append(now)
+                self.next_chat_send[chat_id] = now + self.chat_interval(chat_id)
+                self.in_flight += 1
+
+            method, payload, future, attempts = entry
+            try:
+                result, retry_after = self.post(method, payload)
+            except Exception as e:
+                result, retry_after = e, None
+
+            with self.condition:
+                self.in_flight -= 1
+                if retry_after is not None and attempts < TELEGRAM_MAX_RETRIES:
+                    logger.warning(f"Telegram asked to retry {method} to {chat_id} after {retry_after}s")
+                    self.next_chat_send[chat_id] = time.monotonic() + retry_after
+                    self.pause_chat(chat_id, retry_after)
+                    entry[3] += 1
+                    # Put it back in front unless a newer coalesced request took its place.
+                    queue = self.queues.setdefault(chat_id, OrderedDict())
+                    if key in queue:
+                        queue[key][2].add_done_callback(
+                            lambda newer, future=future: chain(newer, future))
+                    else:
+                        queue[key] = entry
+                        queue.move_to_end(key, last=False)
+                    result = None
+                self.condition.notify_all()
+
+            if result is None:
+                continue
+            if isinstance(result, Exception):
+                logger.error(f"Telegram {method} to {chat_id} failed: {result}")
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def post(self, method, payload):
+        """
+        :return: (decoded response, retry_after or None).
+        """
+        response = self.session.post(
+            f"{self.api_url}/{method}", data=payload, timeout=TELEGRAM_TIMEOUT)
+        data = response.json()
+        if response.status_code == 429:
+            retry_after = data.get('parameters', {}).get('retry_after', 1)
+            return data, retry_after
+        return data, None
+
+
+def chain(source, target):
+    if source.cancelled():
+        target.set_exception(CancelledError())
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+sender = TelegramSender()
+
+
+@atexit.register
+def flush_on_exit():
+    # Management commands exit right after queuing; don't drop their messages.
+    sender.flush(timeout=30)
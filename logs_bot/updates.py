@@ -0,0 +1,55 @@
+import logging
+
+from django.conf import settings
+from django.utils.timezone import now
+
+from logs_bot.models import TelegramUpdate
+from logs_bot.utils import handle_update
+
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_UPDATE_MAX_ATTEMPTS = getattr(settings, 'TELEGRAM_UPDATE_MAX_ATTEMPTS', 3)
+
+
+def store_update(update):
+    """
+    Persists a raw webhook update with a single INSERT. A retried update with
+    an ``update_id`` that was already stored is ignored.
+    """
+    TelegramUpdate.objects.bulk_create(
+        [TelegramUpdate(update_id=update['update_id'], payload=update)],
+        ignore_conflicts=True)
+
+
+def process_pending_updates(batch_size=100):
+    """
+    Handles stored updates in ``update_id`` order. Run a single consumer, so
+    updates are not handled out of order.
+
+    A failing update is retried before any later update, up to
+    TELEGRAM_UPDATE_MAX_ATTEMPTS times, and then skipped.
+
+    :return: The number of updates handled successfully.
+    """
+    handled = 0
+    updates = TelegramUpdate.objects.filter(
+        processed_at__isnull=True).order_by('update_id')[:batch_size]
+    for update in updates:
+        update.attempts += 1
+        try:
+            handle_update(update.payload)
+        except Exception as e:
+            logger.exception(f"Telegram update {update.update_id} failed")
+            update.last_error = str(e)
+            if update.attempts >= TELEGRAM_UPDATE_MAX_ATTEMPTS:
+                update.processed_at = now()
+                update.save(update_fields=['attempts', 'last_error', 'processed_at'])
+                continue
+            update.save(update_fields=['attempts', 'last_error'])
+            break
+
+        update.processed_at = now()
+        update.save(update_fields=['attempts', 'processed_at'])
+        handled += 1
+    return handled
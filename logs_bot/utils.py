@@ -1,17 +1,21 @@
-import requests
-from logs_bot.credentials import PRISUNION_ERRORS_ID, PRISUNION_STORE_ID, TELEGRAM_API_URL
+from logs_bot.credentials import PRISUNION_ERRORS_ID, PRISUNION_STORE_ID
 from logs_bot.models import TelegramUser
+from logs_bot.sender import sender
 from prison_market.models import Order, OrderItem
 import json
 from django.utils.timezone import now
 from django.utils.html import escape
 
-from prison_market.utils import send_notification
+from prison_market.utils import dispatch_notification
 
 
 def send_message(chat_id, text):
-    requests.post(f'{TELEGRAM_API_URL}/sendMessage',
-                  data={'chat_id': chat_id, 'text': text})
+    """
+    Queues a plain text message; it is sent by the rate-limited sender.
+
+    :return: A Future for the Telegram API response.
+    """
+    return sender.submit('sendMessage', {'chat_id': chat_id, 'text': text})
 
 
 def notify_new_order(order_id):
@@ -20,6 +24,7 @@ def notify_new_order(order_id):
     and formats the message using HTML in Uzbek language.
 
     :param order_id: The ID of the new order.
+    :return: The Telegram API response, or None if the order does not exist.
     """
     try:
         order = Order.objects.select_related(
@@ -49,7 +54,7 @@ def notify_new_order(order_id):
         [{"text": "📦 Qabul qilish", "callback_data": f"pending_{order.id}"}],
     ]
 
-    send_message_with_buttons(chat_id, message, inline_keyboard)
+    return send_message_with_buttons(chat_id, message, inline_keyboard)
 
 
 def send_message_with_buttons(chat_id, text, inline_keyboard):
@@ -60,6 +65,9 @@ def send_message_with_buttons(chat_id, text, inline_keyboard):
     :param chat_id: Telegram chat ID (individual or group).
     :param text: Message text, formatted as HTML.
     :param inline_keyboard: A list of lists of buttons to include in the message.
+    :return: The Telegram API response.
+    :raises TimeoutError: If the message was not sent within
+        TELEGRAM_REQUEST_TIMEOUT; it is not sent later, so it can be retried.
     """
     payload = {
         'chat_id': chat_id,
@@ -68,8 +76,7 @@ def send_message_with_buttons(chat_id, text, inline_keyboard):
         'reply_markup': json.dumps({"inline_keyboard": inline_keyboard})
     }
 
-    response = requests.post(f'{TELEGRAM_API_URL}/sendMessage', json=payload)
-    return response.json()
+    return sender.request('sendMessage', payload)
 
 
 def send_error_to_telegram(user, error_type, description):
@@ -96,6 +103,16 @@ def send_error_to_telegram(user, error_type, description):
     send_message(chat_id, message)
 
 
+def handle_update(update):
+    """
+    Dispatches a Telegram update to the matching handler.
+    """
+    if 'callback_query' in update:
+        handle_callback_query(update)
+    elif 'message' in update:
+        handle_message(update)
+
+
 def handle_message(update):
     chat_id = update['message']['chat']['id']
     from_user = update['message']['from']
@@ -147,13 +164,13 @@ def handle_callback_query(update):
                 order.status = new_status
                 order.save()
 
-                send_notification(
-                    order.ordered_by.push_notification_user_id,
-                    message=f"status of order changed to {new_status}",
-                    additional_data={
-                        {"order_id": order_id}
-                    }
-                )
+                # Queued on the push pool; the status update does not wait for OneSignal.
+                if order.ordered_by.push_notification_user_id:
+                    dispatch_notification(
+                        order.ordered_by.push_notification_user_id,
+                        message=f"status of order changed to {new_status}",
+                        additional_data={"order_id": order_id}
+                    )
 
             # Reconstruct the message text from order details
             items_details, message = construct_order_message(order)
@@ -210,6 +227,9 @@ def generate_inline_keyboard(order_status, order_id):
 def update_message(chat_id, message_id, text, inline_keyboard):
     """
     Sends a request to Telegram to edit a message with new text and an updated inline keyboard.
+    Edits of the same message that are still queued are coalesced into the latest one.
+
+    :return: A Future for the Telegram API response.
     """
     # Ensure inline_keyboard is a valid JSON object
     reply_markup = json.dumps(
@@ -223,10 +243,8 @@ def update_message(chat_id, message_id, text, inline_keyboard):
         "reply_markup": reply_markup  # Ensure this is a stringified JSON
     }
 
-    response = requests.post(
-        f"{TELEGRAM_API_URL}/editMessageText", data=payload)
-
-    return response.json()
+    return sender.submit('editMessageText', payload,
+                         coalesce_key=('edit', message_id))
 
 
 def register_user_if_not_exists(user_info):
@@ -1,18 +1,19 @@
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
-import requests
 
 from logs_bot.credentials import PRISUNION_ERRORS_ID, PRISUNION_STORE_ID, TELEGRAM_API_URL, TELEGRAM_BOT_TOKEN, URL
-from logs_bot.utils import handle_callback_query, handle_message, send_message, update_message
+from logs_bot.updates import store_update
+from logs_bot.utils import send_message, update_message
 from prison_market.models import Order
+from prisunion.http import session
 from .models import TelegramUser
 import json
 
 
 def setwebhook(request):
-    response = requests.post(
-        f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/setWebhook?url={URL}")
+    response = session.post(
+        f"{TELEGRAM_API_URL}/setWebhook?url={URL}")
 
     return JsonResponse(response.json())
 
@@ -21,9 +22,10 @@ def setwebhook(request):
 @require_POST
 def webhook(request):
     update = json.loads(request.body.decode('utf-8'))
-    if 'callback_query' in update:
-        handle_callback_query(update)
-    elif 'message' in update:
-        handle_message(update)
+    if 'update_id' not in update:
+        return JsonResponse({'ok': False}, status=400)
+
+    # Only the raw update is written here; process_telegram_updates handles it.
+    store_update(update)
 
     return JsonResponse({'ok': True})
@@ -1,12 +1,12 @@
 from django.contrib import admin
-from .models import CategoryBanner, PrisonerContact, Prison, Prisoner, Product, Order, OrderItem, ProductCategory
+from .models import CategoryBanner, PrisonerContact, PrisonerDailyLedger, Prison, Prisoner, Product, Order, OrderItem, ProductCategory
 from django.utils.html import format_html
 from django.contrib import admin
 from django_json_widget.widgets import JSONEditorWidget
 from django.contrib.postgres.fields import JSONField
 from django.db import models
 
-from .models import Notification
+from .models import Broadcast, Notification
 
 
 @admin.register(Prison)
@@ -54,6 +54,13 @@ class OrderItemAdmin(admin.ModelAdmin):
     search_fields = ('order__id', 'product__name')
 
 
+@admin.register(PrisonerDailyLedger)
+class PrisonerDailyLedgerAdmin(admin.ModelAdmin):
+    list_display = ('prisoner', 'date', 'total_weight', 'total_quantity')
+    search_fields = ('prisoner__full_name',)
+    list_filter = ('date',)
+
+
 class CategoryBannerInline(admin.TabularInline):
     model = CategoryBanner
     extra = 1  # Specifies the number of empty forms to display
@@ -75,6 +82,13 @@ class ProductCategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
-    list_display = ('id', 'recipient', 'message', 'all_users')
-    list_filter = ('all_users',)
-    search_fields = ('message',)
+    list_display = ('id', 'recipient', 'title', 'message', 'read', 'created_at')
+    list_filter = ('all_users', 'read')
+    search_fields = ('title', 'message')
+
+
+@admin.register(Broadcast)
+class BroadcastAdmin(admin.ModelAdmin):
+    list_display = ('id', 'title', 'message', 'created_at', 'pushed_at')
+    search_fields = ('title', 'message')
+    readonly_fields = ('pushed_at',)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PrisonMarketConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'prison_market'
+
+    def ready(self):
+        from prison_market import signals  # noqa: F401
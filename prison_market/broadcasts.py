@@ -0,0 +1,108 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils.timezone import now
+
+from logs_bot.outbox import OutboxDeliveryError, enqueue_message, outbox_handler
+from prison_market.caching import bump_model_version, get_model_versions
+from prison_market.models import Broadcast, BroadcastReceipt, PrisonerContact
+from prison_market.utils import send_notification
+
+
+BROADCAST_COUNT_TIMEOUT = getattr(settings, 'BROADCAST_COUNT_TIMEOUT', 60 * 60 * 24)
+
+
+# Both counts are keyed by the Broadcast version, which changes whenever a
+# broadcast is created or deleted. Deleting one also deletes its receipts, so
+# every contact's read count is recounted, not only the total.
+def broadcast_count_key():
+    version = get_model_versions((Broadcast,))[0]
+    return f"broadcasts:count:{version}"
+
+
+def broadcast_read_key(contact_id):
+    version = get_model_versions((Broadcast,))[0]
+    return f"broadcasts:read:{version}:{contact_id}"
+
+
+def broadcasts_for(contact_id):
+    """
+    All broadcasts, annotated with ``read`` for one contact.
+    """
+    receipts = BroadcastReceipt.objects.filter(
+        broadcast=OuterRef('pk'), contact_id=contact_id)
+    return Broadcast.objects.annotate(read=Exists(receipts))
+
+
+def cached_count(key, queryset):
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.add(key, count, timeout=BROADCAST_COUNT_TIMEOUT)
+    return count
+
+
+def get_unread_broadcast_count(contact_id):
+    total = cached_count(broadcast_count_key(), Broadcast.objects.all())
+    read = cached_count(broadcast_read_key(contact_id),
+                        BroadcastReceipt.objects.filter(contact_id=contact_id))
+    return max(total - read, 0)
+
+
+def invalidate_broadcast_count():
+    bump_model_version(Broadcast)
+
+
+def mark_broadcasts_read(contact_id, ids=None):
+    """
+    Records that a contact read the given broadcasts, or all of them when
+    ``ids`` is None.
+
+    :return: The number of broadcasts that were unread.
+    """
+    with transaction.atomic():
+        # Concurrent calls for the same contact queue on its row, so the
+        # unread broadcasts found here are exactly the receipts inserted.
+        list(PrisonerContact.objects.select_for_update().filter(
+            pk=contact_id).values_list('pk', flat=True))
+
+        unread = broadcasts_for(contact_id).filter(read=False)
+        if ids is not None:
+            unread = unread.filter(pk__in=ids)
+        receipts = BroadcastReceipt.objects.bulk_create(
+            [BroadcastReceipt(broadcast_id=pk, contact_id=contact_id)
+             for pk in unread.values_list('pk', flat=True)],
+            # Only for backends without row locks.
+            ignore_conflicts=True)
+
+    if receipts:
+        cache.delete(broadcast_read_key(contact_id))
+    return len(receipts)
+
+
+def schedule_broadcast_push(broadcast):
+    # Written in the transaction that creates the broadcast, sent by drain_outbox.
+    enqueue_message('broadcast', {'broadcast_id': broadcast.pk})
+
+
+@outbox_handler('broadcast')
+def deliver_broadcast(payload):
+    """
+    Pushes a broadcast to every device with one segment call.
+    """
+    broadcast = Broadcast.objects.filter(
+        pk=payload['broadcast_id'], pushed_at__isnull=True).first()
+    if broadcast is None:
+        return
+
+    results = send_notification(
+        all_users=True,
+        message=broadcast.message,
+        additional_data=dict(broadcast.additional_data or {}, broadcast_id=broadcast.pk),
+    )
+    failed = [result for result in results if not result['ok']]
+    if failed:
+        raise OutboxDeliveryError(f"OneSignal rejected the broadcast: {failed[0]['response']}")
+
+    Broadcast.objects.filter(pk=broadcast.pk).update(pushed_at=now())
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+
+CATALOG_CACHE_TIMEOUT = getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60 * 5)
+
+# Query parameters that change the result of a catalog list endpoint.
+CATALOG_PARAMS = ('page', 'size', 'cursor', 'category', 'trending')
+
+PARAM_DEFAULTS = {
+    'page': '1',
+    'size': '10',
+}
+
+TRUTHY = ['true', '1', 't']
+
+
+def model_version_key(model):
+    return f"catalog:version:{model._meta.label_lower}"
+
+
+def get_model_versions(models):
+    """
+    Returns the current version token of every model in ``models``.
+
+    A version is an opaque token rather than a counter, so an evicted version
+    key can never bring back entries that were cached under an older version.
+    """
+    keys = [model_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_model_version(model):
+    """
+    Invalidates every cached response that depends on ``model``.
+    """
+    cache.set(model_version_key(model), uuid.uuid4().hex, timeout=None)
+
+
+def normalize_query_params(request, params=CATALOG_PARAMS):
+    normalized = {}
+    for name in params:
+        value = request.query_params.get(name, PARAM_DEFAULTS.get(name))
+        if value is None:
+            continue
+        value = value.strip()
+        if name == 'trending':
+            value = 'true' if value.lower() in TRUTHY else 'false'
+        normalized[name] = value
+    return normalized
+
+
+def catalog_cache_key(namespace, request, models, params=CATALOG_PARAMS, extra=None):
+    # Image and link fields are built from the request host, so it is part of the key.
+    signature = json.dumps([
+        request.get_host(),
+        normalize_query_params(request, params),
+        extra or {},
+        get_model_versions(models),
+    ], sort_keys=True)
+    digest = hashlib.md5(signature.encode()).hexdigest()
+    return f"catalog:{namespace}:{digest}"
+
+
+def cached_response(namespace, request, models, build, params=CATALOG_PARAMS, extra=None):
+    """
+    Read-through cache for catalog list responses.
+
+    :param namespace: Name of the endpoint, used as the key prefix.
+    :param request: The current DRF request.
+    :param models: Models whose saves or deletes invalidate the response.
+    :param build: Callable returning the response on a cache miss.
+    :param params: Query parameters the response depends on.
+    :param extra: Additional values the response depends on, e.g. URL kwargs.
+    """
+    key = catalog_cache_key(namespace, request, models, params, extra)
+    payload = cache.get(key)
+    if payload is not None:
+        return Response(payload)
+
+    response = build()
+    data = response.data
+    if (response.status_code == 200 and isinstance(data, dict)
+            and data.get('status') == 'success'
+            and isinstance(data.get('pagination', {}), dict)):
+        cache.set(key, data, timeout=CATALOG_CACHE_TIMEOUT)
+    return response
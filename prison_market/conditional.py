@@ -0,0 +1,81 @@
+import hashlib
+import json
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from prison_market.caching import catalog_cache_key, get_model_versions
+
+
+def make_etag(*parts):
+    signature = json.dumps(parts, sort_keys=True, default=str)
+    return f'"{hashlib.md5(signature.encode()).hexdigest()}"'
+
+
+def catalog_validators(namespace, request, models, params, extra=None):
+    """
+    ETag for a catalog response, derived from the same version tokens as the
+    response cache, so it costs no database query.
+    """
+    return make_etag(catalog_cache_key(namespace, request, models, params, extra)), None
+
+
+def queryset_validators(queryset, request):
+    """
+    ETag and Last-Modified for a list of rows, from a single aggregate query.
+
+    Only models with an ``updated_at`` column can be validated this way, for
+    other models ``(None, None)`` is returned and no conditional request is
+    answered.
+    """
+    fields = {field.name for field in queryset.model._meta.concrete_fields}
+    if 'updated_at' not in fields:
+        return None, None
+
+    aggregates = queryset.order_by().aggregate(
+        count=Count('pk'), last_pk=Max('pk'), last_modified=Max('updated_at'))
+    etag = make_etag(
+        request.get_full_path(), getattr(request.user, 'pk', None),
+        aggregates['count'], aggregates['last_pk'], aggregates['last_modified'])
+    return etag, aggregates['last_modified']
+
+
+def instance_validators(instance):
+    """
+    ETag and Last-Modified for a single row from its column values, without
+    serializing it. The model's catalog version is included because the
+    response also depends on which image renditions exist, which the
+    rendition worker signals by bumping it.
+    """
+    values = [getattr(instance, field.attname)
+              for field in instance._meta.concrete_fields]
+    version = get_model_versions((type(instance),))[0]
+    return (make_etag(instance._meta.label_lower, version, values),
+            getattr(instance, 'updated_at', None))
+
+
+def conditional_response(request, build, etag=None, last_modified=None):
+    """
+    Answers ``304 Not Modified`` when the client's If-None-Match /
+    If-Modified-Since validators match, otherwise calls ``build`` and adds the
+    validators to its response.
+    """
+    if etag is None and last_modified is None:
+        return build()
+
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    not_modified = get_conditional_response(
+        request._request, etag=etag, last_modified=timestamp)
+    if not_modified is not None:
+        response = not_modified
+    else:
+        response = build()
+        if response.status_code != 200:
+            return response
+
+    if etag:
+        response['ETag'] = etag
+    if timestamp:
+        response['Last-Modified'] = http_date(timestamp)
+    return response
@@ -0,0 +1,112 @@
+"""
+Fast-path serialization for the high-volume list endpoints.
+
+These functions produce the same JSON as ``ProductListSerializer``,
+``OrderSerializer`` and ``OrderItemSerializer`` from ``values()`` rows, so no
+model instances or serializer fields are built per row and product image URLs
+are resolved in one batch per request.
+"""
+from django.core.files.storage import default_storage
+from rest_framework import serializers
+
+from prison_market.renditions import rendition_urls
+
+
+# Shared field instances, so number and date formatting follows the
+# REST_FRAMEWORK settings exactly like the ModelSerializers do.
+decimal_field = serializers.DecimalField(max_digits=10, decimal_places=2)
+datetime_field = serializers.DateTimeField()
+
+PRODUCT_LIST_FIELDS = ('id', 'name', 'price', 'weight', 'image', 'category_id')
+
+ORDER_FIELDS = ('id', 'created_at', 'updated_at', 'status', 'total', 'payment_status',
+                'delivery_confirmation_image', 'prisoner_id', 'ordered_by_id', 'transaction_id')
+
+ORDER_ITEM_FIELDS = ('id', 'quantity', 'price_at_time_of_order', 'order_id',
+                     'product_id', 'product__name', 'product__price', 'product__weight',
+                     'product__image', 'product__category_id')
+
+
+def decimal(value):
+    return decimal_field.to_representation(value) if value is not None else None
+
+
+def datetime(value):
+    return datetime_field.to_representation(value) if value is not None else None
+
+
+def serialize_products(rows, request=None, rendition='thumb'):
+    """
+    :param rows: ``Product`` rows from ``values(*PRODUCT_LIST_FIELDS)``.
+    """
+    rows = list(rows)
+    images = rendition_urls([row['image'] for row in rows], rendition, request)
+    return [
+        {
+            'id': row['id'],
+            'name': row['name'],
+            'price': decimal(row['price']),
+            'weight': decimal(row['weight']),
+            'image': image,
+            'category': row['category_id'],
+        }
+        for row, image in zip(rows, images)
+    ]
+
+
+def media_url(name, request=None):
+    # Like DRF's ImageField: the URL is made absolute but the scheme is kept,
+    # and storages that return absolute URLs (e.g. a CDN) are left alone.
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def serialize_orders(rows, request=None):
+    """
+    :param rows: ``Order`` rows from ``values(*ORDER_FIELDS)``.
+    """
+    return [
+        {
+            'id': row['id'],
+            'created_at': datetime(row['created_at']),
+            'updated_at': datetime(row['updated_at']),
+            'status': row['status'],
+            'total': decimal(row['total']),
+            'payment_status': row['payment_status'],
+            'delivery_confirmation_image': (
+                media_url(row['delivery_confirmation_image'], request)
+                if row['delivery_confirmation_image'] else None),
+            'prisoner': row['prisoner_id'],
+            'ordered_by': row['ordered_by_id'],
+            'transaction': row['transaction_id'],
+        }
+        for row in rows
+    ]
+
+
+def serialize_order_items(rows, request=None, rendition='thumb'):
+    """
+    :param rows: ``OrderItem`` rows from ``values(*ORDER_ITEM_FIELDS)``.
+    """
+    rows = list(rows)
+    products = serialize_products([
+        {
+            'id': row['product_id'],
+            'name': row['product__name'],
+            'price': row['product__price'],
+            'weight': row['product__weight'],
+            'image': row['product__image'],
+            'category_id': row['product__category_id'],
+        }
+        for row in rows
+    ], request, rendition)
+    return [
+        {
+            'id': row['id'],
+            'product': product,
+            'quantity': row['quantity'],
+            'price_at_time_of_order': decimal(row['price_at_time_of_order']),
+            'order': row['order_id'],
+        }
+        for row, product in zip(rows, products)
+    ]
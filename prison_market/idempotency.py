@@ -0,0 +1,89 @@
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from prisunion.locks import acquire_lock, release_lock
+
+
+IDEMPOTENCY_KEY_TTL = getattr(settings, 'IDEMPOTENCY_KEY_TTL', 60 * 60 * 24)
+# How long an execution may hold a key before another request may take over.
+IDEMPOTENCY_LOCK_TIMEOUT = getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 60)
+# How long a concurrent duplicate waits for the first execution to finish.
+IDEMPOTENCY_WAIT_TIMEOUT = getattr(settings, 'IDEMPOTENCY_WAIT_TIMEOUT', 30)
+
+
+def idempotency_cache_key(request, key):
+    user_id = getattr(request.user, 'pk', None)
+    scope = f"{user_id}:{request.path}:{key}"
+    return f"idempotency:{hashlib.sha256(scope.encode()).hexdigest()}"
+
+
+def replay(stored):
+    response = Response(stored['data'], status=stored['status'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view_method):
+    """
+    Makes a POST handler idempotent per ``Idempotency-Key`` header.
+
+    The first request with a key runs the view and stores its response for
+    IDEMPOTENCY_KEY_TTL seconds, retries with the same key get the stored
+    response without running the view again. A duplicate that arrives while
+    the first request is still running waits for its response instead of
+    running concurrently. Server errors are not stored, so they can be
+    retried. Requests without the header are not affected.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.META.get('HTTP_IDEMPOTENCY_KEY')
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+
+        response_key = idempotency_cache_key(request, key)
+        lock_key = f"{response_key}:lock"
+        fingerprint = hashlib.sha256(request.body).hexdigest()
+
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_TIMEOUT
+        delay = 0.05
+        while True:
+            stored = cache.get(response_key)
+            if stored is not None:
+                if stored['fingerprint'] != fingerprint:
+                    return Response({
+                        'status': 'error',
+                        'message': 'Idempotency-Key was already used with a different request body.',
+                    }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                return replay(stored)
+
+            token = acquire_lock(lock_key, IDEMPOTENCY_LOCK_TIMEOUT)
+            if token is not None:
+                break
+
+            if time.monotonic() >= deadline:
+                return Response({
+                    'status': 'error',
+                    'message': 'A request with this Idempotency-Key is still being processed.',
+                }, status=status.HTTP_409_CONFLICT)
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code < 500:
+                cache.set(response_key, {
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'data': response.data,
+                }, timeout=IDEMPOTENCY_KEY_TTL)
+            return response
+        finally:
+            release_lock(lock_key, token)
+
+    return wrapper
@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from prison_market.models import Notification
+
+
+# The counter is kept exact by the signals and mark_read once their
+# transactions commit; the timeout only bounds drift from writes that bypass
+# them (e.g. QuerySet.update()).
+UNREAD_COUNT_TIMEOUT = getattr(settings, 'UNREAD_COUNT_TIMEOUT', 60 * 60 * 24)
+
+
+def unread_count_key(contact_id):
+    return f"notifications:unread:{contact_id}"
+
+
+def get_unread_count(contact_id):
+    """
+    Returns the number of unread notifications of a contact, counting them
+    only when the cached counter is missing.
+    """
+    key = unread_count_key(contact_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(recipient_id=contact_id, read=False).count()
+        cache.add(key, count, timeout=UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+def invalidate_unread_count(contact_id):
+    cache.delete(unread_count_key(contact_id))
+
+
+def adjust_unread_count(contact_id, delta):
+    # A missing counter is left missing; the next read counts it.
+    if not delta:
+        return
+    try:
+        if delta > 0:
+            cache.incr(unread_count_key(contact_id), delta)
+        else:
+            cache.decr(unread_count_key(contact_id), -delta)
+    except ValueError:
+        pass
+
+
+def mark_read(contact_id, ids=None):
+    """
+    Marks notifications of a contact as read.
+
+    :param ids: Notification IDs to mark, or None for all of them.
+    :return: The number of notifications that were unread.
+    """
+    queryset = Notification.objects.filter(recipient_id=contact_id, read=False)
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    updated = queryset.update(read=True)
+    transaction.on_commit(lambda: adjust_unread_count(contact_id, -updated))
+    return updated
@@ -0,0 +1,117 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import DecimalField, F, Sum, Value
+from django.db.models.functions import Greatest
+from django.utils.timezone import localdate
+
+from prison_market.models import OrderItem, PrisonerDailyLedger
+
+
+MAX_DAILY_WEIGHT = Decimal(str(getattr(settings, 'MAX_DAILY_WEIGHT', 12)))
+MAX_DAILY_QUANTITY = getattr(settings, 'MAX_DAILY_QUANTITY', 12)
+
+# Orders whose payment ends in this status no longer count towards the limits.
+CANCELLED_PAYMENT_STATUS = 'cancelled'
+
+
+class DailyLimitExceeded(Exception):
+    def __init__(self, remaining_weight, remaining_quantity):
+        self.remaining_weight = remaining_weight
+        self.remaining_quantity = remaining_quantity
+        super().__init__(f"Exceeds the daily limit: {remaining_weight} kg remaining.")
+
+
+def compute_daily_totals(prisoner, day):
+    """
+    Totals from the order items themselves. Only used to seed a ledger row
+    the first time a prisoner orders on a given day.
+    """
+    totals = OrderItem.objects.filter(
+        order__prisoner=prisoner, order__created_at__date=day,
+    ).aggregate(
+        weight=Sum(F('quantity') * F('product__weight'),
+                   output_field=DecimalField(max_digits=10, decimal_places=2)),
+        quantity=Sum('quantity'),
+    )
+    weight = Decimal(totals['weight'] or 0).quantize(Decimal('0.01'))
+    return weight, totals['quantity'] or 0
+
+
+def get_ledger(prisoner, day=None):
+    day = day or localdate()
+    ledger = PrisonerDailyLedger.objects.filter(prisoner=prisoner, date=day).first()
+    if ledger is None:
+        weight, quantity = compute_daily_totals(prisoner, day)
+        ledger, _ = PrisonerDailyLedger.objects.get_or_create(
+            prisoner=prisoner, date=day,
+            defaults={'total_weight': weight, 'total_quantity': quantity})
+    return ledger
+
+
+def get_remaining_allowance(prisoner, day=None):
+    """
+    :return: A ``(remaining_weight, remaining_quantity)`` tuple for the day.
+    """
+    ledger = get_ledger(prisoner, day)
+    return (MAX_DAILY_WEIGHT - ledger.total_weight,
+            MAX_DAILY_QUANTITY - ledger.total_quantity)
+
+
+def order_lines_totals(lines):
+    lines = list(lines)
+    weight = sum((product.weight * quantity for product, quantity in lines), Decimal('0'))
+    return weight, sum(quantity for _, quantity in lines)
+
+
+def record_order_items(prisoner, lines, day=None, max_weight=None):
+    """
+    Adds ordered items to the prisoner's ledger for the day. Must be called in
+    the order's transaction, before its order items are created (a missing
+    row is seeded from the items already in the database).
+
+    The limit check and the increment are a single conditional UPDATE, and
+    the updated row stays locked until the transaction ends, so concurrent
+    orders cannot both pass the check.
+
+    :param lines: An iterable of ``(product, quantity)`` tuples.
+    :param max_weight: If given, the items are only recorded if the day's
+        total weight stays within it.
+    :raises DailyLimitExceeded: If recording the items would exceed ``max_weight``.
+    """
+    day = day or localdate()
+    weight, quantity = order_lines_totals(lines)
+
+    get_ledger(prisoner, day)
+    ledger = PrisonerDailyLedger.objects.filter(prisoner=prisoner, date=day)
+    if max_weight is not None:
+        ledger = ledger.filter(total_weight__lte=max_weight - weight)
+    updated = ledger.update(
+        total_weight=F('total_weight') + weight,
+        total_quantity=F('total_quantity') + quantity)
+    if not updated:
+        remaining_weight, remaining_quantity = get_remaining_allowance(prisoner, day)
+        raise DailyLimitExceeded(remaining_weight, remaining_quantity)
+
+
+def release_order_items(prisoner_id, lines, day):
+    """
+    Gives the allowance of deleted or cancelled items back. Days without a
+    ledger row are left alone: they are seeded from the remaining items.
+
+    :param lines: An iterable of ``(product, quantity)`` tuples.
+    """
+    weight, quantity = order_lines_totals(lines)
+    PrisonerDailyLedger.objects.filter(prisoner_id=prisoner_id, date=day).update(
+        total_weight=Greatest(F('total_weight') - weight, Value(Decimal('0'))),
+        total_quantity=Greatest(F('total_quantity') - quantity, Value(0)))
+
+
+def release_order(order):
+    """
+    Releases all items of a cancelled order.
+    """
+    lines = [(item.product, item.quantity)
+             for item in order.items.select_related('product')]
+    if lines:
+        release_order_items(order.prisoner_id, lines, localdate(order.created_at))
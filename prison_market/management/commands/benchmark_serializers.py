@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from prison_market.fast_serializers import (
+    ORDER_FIELDS,
+    ORDER_ITEM_FIELDS,
+    PRODUCT_LIST_FIELDS,
+    serialize_order_items,
+    serialize_orders,
+    serialize_products,
+)
+from prison_market.models import Order, OrderItem, Product
+from prison_market.serializers import OrderItemSerializer, OrderSerializer, ProductListSerializer
+
+
+class Command(BaseCommand):
+    help = "Compares rows/sec of the ModelSerializer and fast-path list serialization."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100,
+                            help="Rows per page, like the size query param.")
+        parser.add_argument('--repeat', type=int, default=20,
+                            help="Number of pages serialized per measurement.")
+
+    def handle(self, *args, **options):
+        request = Request(APIRequestFactory().get('/'))
+        rows, repeat = options['rows'], options['repeat']
+
+        cases = [
+            ('products', Product.objects.order_by('-id'),
+             lambda qs: ProductListSerializer(qs, many=True, context={'request': request}).data,
+             PRODUCT_LIST_FIELDS, lambda qs: serialize_products(qs, request)),
+            ('orders', Order.objects.order_by('-id'),
+             lambda qs: OrderSerializer(qs, many=True, context={'request': request}).data,
+             ORDER_FIELDS, lambda qs: serialize_orders(qs, request)),
+            ('order items', OrderItem.objects.order_by('-id'),
+             lambda qs: OrderItemSerializer(qs, many=True, context={'request': request}).data,
+             ORDER_ITEM_FIELDS, lambda qs: serialize_order_items(qs, request)),
+        ]
+
+        for name, queryset, serialize, fields, fast_serialize in cases:
+            page = queryset[:rows]
+            fast_page = queryset.values(*fields)[:rows]
+            count = len(page)
+            if not count:
+                self.stdout.write(f"{name}: no rows, skipped")
+                continue
+
+            before = self.measure(lambda: serialize(page.all()), repeat)
+            after = self.measure(lambda: fast_serialize(fast_page.all()), repeat)
+            self.stdout.write(
+                f"{name}: {count * repeat / before:,.0f} rows/sec -> "
+                f"{count * repeat / after:,.0f} rows/sec ({before / after:.1f}x)")
+
+    def measure(self, serialize, repeat):
+        # Each run re-evaluates the queryset, so the query is part of the cost.
+        start = time.perf_counter()
+        for _ in range(repeat):
+            serialize()
+        return time.perf_counter() - start
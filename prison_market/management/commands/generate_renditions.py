@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from prison_market.caching import bump_model_version
+from prison_market.renditions import RENDITION_FIELDS, generate_instance_renditions
+
+
+class Command(BaseCommand):
+    help = "Generates thumbnail and WebP renditions for existing product, banner and contact images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', choices=[model.__name__ for model in RENDITION_FIELDS],
+            help="Only process images of this model.")
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Regenerate renditions that already exist.")
+
+    def handle(self, *args, **options):
+        for model, (field_name, _) in RENDITION_FIELDS.items():
+            if options['model'] and model.__name__ != options['model']:
+                continue
+
+            queryset = model.objects.exclude(**{field_name: ''}).exclude(
+                **{f"{field_name}__isnull": True}).only('pk', field_name)
+            written = 0
+            for instance in queryset.iterator():
+                written += generate_instance_renditions(
+                    instance, force=options['force'])
+
+            # Cached catalog responses still point at the original uploads.
+            bump_model_version(model)
+            self.stdout.write(self.style.SUCCESS(
+                f"{model.__name__}: wrote {written} renditions"))
@@ -152,6 +152,26 @@ class OrderItem(models.Model):
         return f"{self.quantity} x {self.product.name} for {self.order}"
 
 
+class PrisonerDailyLedger(models.Model):
+    """
+    Running totals of what has been ordered for a prisoner on a given day,
+    maintained in the same transaction as the order items so daily limit
+    checks are a single row lookup.
+    """
+    prisoner = models.ForeignKey(
+        Prisoner, related_name='daily_ledgers', on_delete=models.CASCADE)
+    date = models.DateField()
+    total_weight = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0)
+    total_quantity = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.prisoner} on {self.date}: {self.total_quantity} items, {self.total_weight} kg"
+
+    class Meta:
+        unique_together = ('prisoner', 'date')
+
+
 class AuditRecord(models.Model):
     action = models.CharField(max_length=200)
     model = models.CharField(max_length=200)
@@ -167,11 +187,14 @@ class AuditRecord(models.Model):
 class Notification(models.Model):
     recipient = models.ForeignKey(
         PrisonerContact, on_delete=models.CASCADE, related_name='notifications')
+    title = models.CharField(max_length=200, blank=True)
     message = models.TextField()
     all_users = models.BooleanField(
         default=False, help_text="Send notification to all users.")
     additional_data = JSONField(
         blank=True, null=True, help_text="JSON structure for additional data.")
+    read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"Notification #{self.id}"
@@ -179,3 +202,36 @@ class Notification(models.Model):
     class Meta:
         verbose_name = "Notification"
         verbose_name_plural = "Notifications"
+        # The inbox is read newest first per recipient. Rows are created in
+        # id order, so the keyset pager seeks on (recipient, id).
+        indexes = [
+            models.Index(fields=['recipient', '-created_at']),
+            models.Index(fields=['recipient', '-id']),
+        ]
+
+
+class Broadcast(models.Model):
+    """
+    An announcement to every contact, stored once. Read state is kept per
+    contact in ``BroadcastReceipt`` rows, created only when a contact reads it.
+    """
+    title = models.CharField(max_length=200, blank=True)
+    message = models.TextField()
+    additional_data = JSONField(
+        blank=True, null=True, help_text="JSON structure for additional data.")
+    created_at = models.DateTimeField(auto_now_add=True)
+    pushed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Broadcast #{self.id}"
+
+
+class BroadcastReceipt(models.Model):
+    broadcast = models.ForeignKey(
+        Broadcast, on_delete=models.CASCADE, related_name='receipts')
+    contact = models.ForeignKey(
+        PrisonerContact, on_delete=models.CASCADE, related_name='broadcast_receipts')
+    read_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('contact', 'broadcast')
@@ -0,0 +1,236 @@
+import hashlib
+import logging
+import posixpath
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from logs_bot.outbox import enqueue_message, outbox_handler
+from prison_market.caching import bump_model_version
+from prison_market.models import CategoryBanner, PrisonerContact, Product
+from prisoner_contact_auth.utils import ensure_https
+
+
+logger = logging.getLogger(__name__)
+
+# Rendition name -> bounding box and whether the image is cropped to exactly
+# that size (thumbnails) or only scaled down to fit inside it.
+RENDITIONS = getattr(settings, 'IMAGE_RENDITIONS', {
+    'thumb': {'size': (320, 320), 'crop': True},
+    'medium': {'size': (1080, 1080), 'crop': False},
+    'banner': {'size': (1080, 540), 'crop': False},
+})
+
+# Format served by rendition_url. Both formats are always generated.
+IMAGE_RENDITION_FORMAT = getattr(settings, 'IMAGE_RENDITION_FORMAT', 'webp')
+
+FORMATS = {
+    'jpg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+}
+
+# Model -> (image field, renditions generated for it).
+RENDITION_FIELDS = {
+    Product: ('image', ('thumb', 'medium')),
+    CategoryBanner: ('image', ('banner',)),
+    PrisonerContact: ('picture', ('thumb', 'medium')),
+}
+
+
+def rendition_name(name, rendition, fmt):
+    """
+    Returns the storage name of a rendition, e.g.
+    ``media/products/renditions/tea_thumb.webp`` for ``media/products/tea.jpg``.
+    """
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'renditions', f"{stem}_{rendition}.{fmt}")
+
+
+def availability_key(name):
+    return f"rendition:exists:{hashlib.md5(name.encode()).hexdigest()}"
+
+
+def rendition_available(storage, name):
+    available = cache.get(availability_key(name))
+    if available is None:
+        available = storage.exists(name)
+        # Missing renditions are re-checked soon, they may still be generated.
+        cache.set(availability_key(name), available,
+                  timeout=None if available else 60)
+    return available
+
+
+def render(source, spec, fmt):
+    size = spec['size']
+    if spec['crop']:
+        image = ImageOps.fit(source, size, Image.LANCZOS)
+    else:
+        image = source.copy()
+        image.thumbnail(size, Image.LANCZOS)
+
+    options = dict(FORMATS[fmt])
+    if options['format'] == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, **options)
+    return buffer.getvalue()
+
+
+def generate_renditions(field_file, renditions, force=False):
+    """
+    Generates the given renditions of an uploaded image in every format.
+
+    :param field_file: The ``FieldFile`` of the original upload.
+    :param renditions: Names of the renditions to generate.
+    :param force: Regenerate renditions that already exist.
+    :return: The number of files written.
+    """
+    if not field_file:
+        return 0
+
+    storage = field_file.storage
+    pending = [
+        (rendition, fmt, rendition_name(field_file.name, rendition, fmt))
+        for rendition in renditions
+        for fmt in FORMATS
+    ]
+    if not force:
+        pending = [item for item in pending if not storage.exists(item[2])]
+    if not pending:
+        return 0
+
+    try:
+        with storage.open(field_file.name, 'rb') as original:
+            source = Image.open(original)
+            source = ImageOps.exif_transpose(source)
+            source.load()
+        if source.mode in ('P', 'LA'):
+            source = source.convert('RGBA')
+    except (OSError, UnidentifiedImageError) as e:
+        logger.warning(f"Cannot generate renditions for {field_file.name}: {e}")
+        return 0
+
+    for rendition, fmt, name in pending:
+        content = render(source, RENDITIONS[rendition], fmt)
+        if storage.exists(name):
+            storage.delete(name)
+        storage.save(name, ContentFile(content))
+        cache.set(availability_key(name), True, timeout=None)
+    return len(pending)
+
+
+def generate_instance_renditions(instance, force=False):
+    field_name, renditions = RENDITION_FIELDS[type(instance)]
+    return generate_renditions(getattr(instance, field_name), renditions, force)
+
+
+def delete_renditions(storage, name, renditions):
+    """
+    Deletes the renditions of an image that was replaced or deleted.
+    """
+    for rendition in renditions:
+        for fmt in FORMATS:
+            candidate = rendition_name(name, rendition, fmt)
+            if storage.exists(candidate):
+                storage.delete(candidate)
+            cache.delete(availability_key(candidate))
+
+
+def schedule_renditions(instance, name, stale=None):
+    """
+    Queues generating the renditions of ``name`` and deleting those of
+    ``stale``, so uploads do not wait for the resizing. Written in the
+    transaction that saves the instance, processed by drain_outbox.
+    """
+    enqueue_message('image_renditions', {
+        'model': instance._meta.label_lower,
+        'pk': instance.pk,
+        'name': name,
+        'stale': stale,
+    })
+
+
+@outbox_handler('image_renditions')
+def deliver_image_renditions(payload):
+    model = apps.get_model(payload['model'])
+    field_name, renditions = RENDITION_FIELDS[model]
+    if payload['stale']:
+        storage = model._meta.get_field(field_name).storage
+        delete_renditions(storage, payload['stale'], renditions)
+    if not payload['name']:
+        return
+
+    instance = model.objects.filter(pk=payload['pk']).first()
+    # Skip images that were replaced again since; their own message follows.
+    if instance is None or getattr(instance, field_name).name != payload['name']:
+        return
+    if generate_instance_renditions(instance):
+        # Cached catalog responses still point at the original upload.
+        bump_model_version(model)
+
+
+def rendition_url(field_file, rendition, request=None):
+    """
+    Returns the absolute HTTPS URL of a rendition, falling back to the
+    original upload when the rendition has not been generated yet.
+    """
+    if not field_file:
+        return None
+
+    name = rendition_name(field_file.name, rendition, IMAGE_RENDITION_FORMAT)
+    if rendition_available(field_file.storage, name):
+        url = field_file.storage.url(name)
+    else:
+        url = field_file.url
+
+    if request is not None:
+        return ensure_https(request.build_absolute_uri(url))
+    return ensure_https(url)
+
+
+def absolute_url_builder(request):
+    """
+    Returns a function turning storage-relative URLs into absolute HTTPS URLs,
+    resolving the request host once instead of once per URL.
+    """
+    base = ensure_https(request.build_absolute_uri('/')[:-1]) if request is not None else ''
+
+    def build(url):
+        return ensure_https(base + url if url.startswith('/') else url)
+    return build
+
+
+def rendition_urls(names, rendition, request=None, storage=default_storage):
+    """
+    Batch version of ``rendition_url`` for raw image names, e.g. from
+    ``values()`` rows. Availability is looked up with a single cache call.
+    """
+    candidates = {
+        name: rendition_name(name, rendition, IMAGE_RENDITION_FORMAT)
+        for name in names if name
+    }
+    keys = {availability_key(candidate): candidate for candidate in candidates.values()}
+    cached = cache.get_many(list(keys))
+    available = set()
+    for key, candidate in keys.items():
+        if key in cached:
+            if cached[key]:
+                available.add(candidate)
+        elif rendition_available(storage, candidate):
+            available.add(candidate)
+
+    build = absolute_url_builder(request)
+    urls = []
+    for name in names:
+        if not name:
+            urls.append(None)
+            continue
+        candidate = candidates[name]
+        urls.append(build(storage.url(candidate if candidate in available else name)))
+    return urls
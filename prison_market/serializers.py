@@ -7,7 +7,8 @@ from .models import PrisonerContact
 from django.contrib.auth import authenticate
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
-from .models import Notification
+from .models import Broadcast, Notification
+from .renditions import rendition_url
 
 
 class ProductCategorySerializer(serializers.ModelSerializer):
@@ -31,21 +32,21 @@ class ProductListSerializer(serializers.ModelSerializer):
 
     def get_image(self, obj):
         """Method to get the image field value."""
-        if obj.image:
-            request = self.context.get('request')
-            image_url = obj.image.url
-            if request:
-                return ensure_https(request.build_absolute_uri(image_url))
-            else:
-                return ensure_https(image_url)
-        return None
+        return rendition_url(obj.image, self.context.get('rendition', 'thumb'),
+                             self.context.get('request'))
 
 
 class ProductDetailSerializer(serializers.ModelSerializer):
+    image = serializers.SerializerMethodField()
+
     class Meta:
         model = Product
         fields = '__all__'
 
+    def get_image(self, obj):
+        return rendition_url(obj.image, self.context.get('rendition', 'medium'),
+                             self.context.get('request'))
+
 
 class OrderSerializer(serializers.ModelSerializer):
     class Meta:
@@ -64,6 +65,28 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class OrderHistoryItemSerializer(serializers.ModelSerializer):
+    product = ProductListSerializer(read_only=True)
+
+    class Meta:
+        model = OrderItem
+        fields = ['id', 'product', 'quantity', 'price_at_time_of_order']
+
+
+class OrderHistorySerializer(serializers.ModelSerializer):
+    """
+    An order with its items and product summaries embedded. Expects the
+    queryset to select ``prisoner`` and prefetch ``items__product``.
+    """
+    prisoner_name = serializers.CharField(source='prisoner.full_name', read_only=True)
+    items = OrderHistoryItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ['id', 'created_at', 'updated_at', 'status', 'total', 'payment_status',
+                  'prisoner', 'prisoner_name', 'ordered_by', 'transaction', 'items']
+
+
 class PrisonerContactTokenObtainPairSerializer(TokenObtainPairSerializer):
     def validate(self, attrs):
         # The default result (access and refresh tokens)
@@ -113,9 +136,8 @@ class CategoryBannerSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
 
         # Ensure the image URL is absolute and uses HTTPS
-        if instance.image and request:
-            representation['image'] = ensure_https(
-                request.build_absolute_uri(instance.image.url))
+        representation['image'] = rendition_url(
+            instance.image, self.context.get('rendition', 'banner'), request)
 
         # Dynamically construct the category link
         if instance.category_id and request:
@@ -134,3 +156,12 @@ class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = ['id', 'recipient', 'title', 'message', 'created_at', 'read']
+
+
+class BroadcastSerializer(serializers.ModelSerializer):
+    # Annotated by broadcasts_for().
+    read = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = Broadcast
+        fields = ['id', 'title', 'message', 'additional_data', 'created_at', 'read']
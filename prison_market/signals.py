@@ -0,0 +1,140 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils.timezone import localdate
+
+from prison_market.broadcasts import invalidate_broadcast_count, schedule_broadcast_push
+from prison_market.caching import bump_model_version
+from prison_market.inbox import adjust_unread_count, invalidate_unread_count
+from prison_market.ledger import CANCELLED_PAYMENT_STATUS, release_order, release_order_items
+from prison_market.models import (
+    Broadcast, CategoryBanner, Notification, Order, OrderItem, Product, ProductCategory)
+from prison_market.renditions import RENDITION_FIELDS, schedule_renditions
+
+
+# Models served through the catalog response cache. Saves and deletes made
+# through the ORM (including the admin) invalidate the cached responses.
+# Note that ``QuerySet.update()`` does not send signals.
+CATALOG_MODELS = (Product, ProductCategory, CategoryBanner)
+
+
+def remember_image_name(sender, instance, update_fields=None, **kwargs):
+    field_name, _ = RENDITION_FIELDS[sender]
+    instance._previous_image_name = None
+    if instance.pk is not None and (update_fields is None or field_name in update_fields):
+        instance._previous_image_name = sender.objects.filter(pk=instance.pk).values_list(
+            field_name, flat=True).first()
+
+
+def create_image_renditions(sender, instance, created, update_fields=None, **kwargs):
+    field_name, _ = RENDITION_FIELDS[sender]
+    if update_fields is not None and field_name not in update_fields:
+        return
+    name = getattr(instance, field_name).name or None
+    previous = getattr(instance, '_previous_image_name', None) or None
+    if name != previous:
+        schedule_renditions(instance, name, stale=previous)
+
+
+def delete_image_renditions(sender, instance, **kwargs):
+    field_name, _ = RENDITION_FIELDS[sender]
+    name = getattr(instance, field_name).name
+    if name:
+        schedule_renditions(instance, None, stale=name)
+
+
+def invalidate_catalog_cache(sender, **kwargs):
+    bump_model_version(sender)
+
+
+# Renditions are generated by the outbox worker only when the image changes;
+# it invalidates the catalog cache again once they exist.
+for model in RENDITION_FIELDS:
+    pre_save.connect(remember_image_name, sender=model,
+                     dispatch_uid=f"image_renditions_pre_save_{model.__name__}")
+    post_save.connect(create_image_renditions, sender=model,
+                      dispatch_uid=f"image_renditions_{model.__name__}")
+    post_delete.connect(delete_image_renditions, sender=model,
+                        dispatch_uid=f"image_renditions_delete_{model.__name__}")
+
+for model in CATALOG_MODELS:
+    post_save.connect(invalidate_catalog_cache, sender=model,
+                      dispatch_uid=f"catalog_cache_save_{model.__name__}")
+    post_delete.connect(invalidate_catalog_cache, sender=model,
+                        dispatch_uid=f"catalog_cache_delete_{model.__name__}")
+
+
+def release_deleted_order_item(sender, instance, **kwargs):
+    # Deleting an order deletes its items first, so this covers both. A
+    # cancelled order's items were already released.
+    order = instance.order
+    if order.payment_status != CANCELLED_PAYMENT_STATUS:
+        release_order_items(order.prisoner_id, [(instance.product, instance.quantity)],
+                            localdate(order.created_at))
+
+
+def release_cancelled_order(sender, instance, **kwargs):
+    if instance.pk is None or instance.payment_status != CANCELLED_PAYMENT_STATUS:
+        return
+    previous = Order.objects.filter(pk=instance.pk).values_list(
+        'payment_status', flat=True).first()
+    if previous is not None and previous != CANCELLED_PAYMENT_STATUS:
+        release_order(instance)
+
+
+# Cancellations made with ``QuerySet.update()`` (payment reconciliation) call
+# release_order() themselves.
+post_delete.connect(release_deleted_order_item, sender=OrderItem,
+                    dispatch_uid="ledger_release_order_item")
+pre_save.connect(release_cancelled_order, sender=Order,
+                 dispatch_uid="ledger_release_cancelled_order")
+
+
+def remember_notification_recipient(sender, instance, **kwargs):
+    # An edit (e.g. in the admin) may change ``read`` or the recipient.
+    instance._previous_recipient_id = None
+    if instance.pk is not None:
+        instance._previous_recipient_id = Notification.objects.filter(
+            pk=instance.pk).values_list('recipient_id', flat=True).first()
+
+
+def count_new_notification(sender, instance, created, **kwargs):
+    if created:
+        if not instance.read:
+            recipient_id = instance.recipient_id
+            transaction.on_commit(lambda: adjust_unread_count(recipient_id, 1))
+        return
+
+    # Edits are rare, recount instead of working out the change.
+    recipient_ids = {instance.recipient_id, getattr(instance, '_previous_recipient_id', None)}
+    for recipient_id in recipient_ids - {None}:
+        transaction.on_commit(lambda recipient_id=recipient_id: invalidate_unread_count(recipient_id))
+
+
+def count_deleted_notification(sender, instance, **kwargs):
+    if not instance.read:
+        recipient_id = instance.recipient_id
+        transaction.on_commit(lambda: adjust_unread_count(recipient_id, -1))
+
+
+pre_save.connect(remember_notification_recipient, sender=Notification,
+                 dispatch_uid="notification_unread_pre_save")
+post_save.connect(count_new_notification, sender=Notification,
+                  dispatch_uid="notification_unread_save")
+post_delete.connect(count_deleted_notification, sender=Notification,
+                    dispatch_uid="notification_unread_delete")
+
+
+def publish_broadcast(sender, instance, created, **kwargs):
+    if created:
+        schedule_broadcast_push(instance)
+        transaction.on_commit(invalidate_broadcast_count)
+
+
+def remove_broadcast(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_broadcast_count)
+
+
+post_save.connect(publish_broadcast, sender=Broadcast,
+                  dispatch_uid="broadcast_publish")
+post_delete.connect(remove_broadcast, sender=Broadcast,
+                    dispatch_uid="broadcast_remove")
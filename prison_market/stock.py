@@ -0,0 +1,74 @@
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, When
+
+from prison_market.models import Product
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_id, requested, available):
+        self.product_id = product_id
+        self.requested = requested
+        self.available = available
+        if available is None:
+            message = f"Insufficient stock for product ID {product_id}."
+        else:
+            message = (f"Insufficient stock for product ID {product_id}: "
+                       f"requested {requested}, available {available}.")
+        super().__init__(message)
+
+
+def reserve_stock(quantities):
+    """
+    Decrements stock for every product of an order, all or nothing.
+
+    Product rows are locked in primary key order, so concurrent orders that
+    share products cannot deadlock, and all decrements are applied in a single
+    conditional UPDATE (``stock >= quantity`` per row). On backends without
+    row locks the condition alone still prevents overselling: if any row no
+    longer has enough stock, nothing is changed.
+
+    :param quantities: A dict of product ID -> quantity to reserve.
+    :return: A dict of product ID -> ``Product`` with the updated stock.
+    :raises Product.DoesNotExist: If a product does not exist.
+    :raises InsufficientStock: If a product does not have enough stock.
+    :raises ValueError: If a quantity is less than 1.
+    """
+    quantities = {int(pk): int(quantity) for pk, quantity in quantities.items()}
+    for pk, quantity in quantities.items():
+        if quantity < 1:
+            # A negative quantity would add stock instead of reserving it.
+            raise ValueError(f"Invalid quantity {quantity} for product ID {pk}.")
+
+    with transaction.atomic():
+        products = {
+            product.pk: product
+            for product in Product.objects.select_for_update().filter(
+                pk__in=quantities).order_by('pk')
+        }
+        missing = set(quantities) - set(products)
+        if missing:
+            raise Product.DoesNotExist(
+                f"No Product matches the given query: {sorted(missing)}")
+
+        for pk, quantity in quantities.items():
+            if products[pk].stock < quantity:
+                raise InsufficientStock(pk, quantity, products[pk].stock)
+
+        condition = Q()
+        for pk, quantity in quantities.items():
+            condition |= Q(pk=pk, stock__gte=quantity)
+        updated = Product.objects.filter(condition).update(stock=Case(
+            *[When(pk=pk, then=F('stock') - quantity) for pk, quantity in quantities.items()],
+            output_field=PositiveIntegerField(),
+        ))
+
+        if updated != len(quantities):
+            # Another order took the stock between the check and the update,
+            # which is only possible without row locks. Leaving the atomic
+            # block with the exception rolls back the rows that were updated.
+            pk = min(quantities, key=lambda pk: products[pk].stock - quantities[pk])
+            raise InsufficientStock(pk, quantities[pk], None)
+
+    for pk, quantity in quantities.items():
+        products[pk].stock -= quantity
+    return products
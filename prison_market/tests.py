@@ -1,3 +1,74 @@
-from django.test import TestCase
+import threading
 
-# Create your tests here.
+from django.db import OperationalError, connection
+from django.test import TransactionTestCase
+
+from prison_market.models import Product, ProductCategory
+from prison_market.stock import InsufficientStock, reserve_stock
+
+
+class ReserveStockConcurrencyTests(TransactionTestCase):
+    """
+    Concurrent reservations run in their own threads and database
+    connections, so this needs real transactions rather than TestCase's
+    single wrapping one.
+    """
+    threads = 8
+    attempts = 10
+
+    def setUp(self):
+        category = ProductCategory.objects.create(name="Stock reservation test")
+        self.product = Product.objects.create(
+            name="Stock reservation test", description="", price=0,
+            category=category, stock=50)
+
+    def reserve_concurrently(self, quantity):
+        results = {'reserved': 0, 'short': 0, 'locked': 0}
+        errors = []
+        lock = threading.Lock()
+        start = threading.Barrier(self.threads)
+
+        def worker():
+            start.wait()
+            try:
+                for _ in range(self.attempts):
+                    try:
+                        reserve_stock({self.product.pk: quantity})
+                        outcome = 'reserved'
+                    except InsufficientStock:
+                        outcome = 'short'
+                    except OperationalError:
+                        # SQLite gives up on busy writers instead of queueing them.
+                        outcome = 'locked'
+                    with lock:
+                        results[outcome] += 1
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return results
+
+    def test_no_lost_updates_or_overselling(self):
+        # More attempts than stock, so some reservations must come up short.
+        results = self.reserve_concurrently(quantity=1)
+
+        self.product.refresh_from_db()
+        self.assertGreater(results['reserved'], 0)
+        self.assertEqual(self.product.stock, 50 - results['reserved'])
+        self.assertGreaterEqual(self.product.stock, 0)
+        self.assertEqual(sum(results.values()), self.threads * self.attempts)
+
+    def test_rejects_non_positive_quantities(self):
+        for quantity in (0, -5):
+            with self.assertRaises(ValueError):
+                reserve_stock({self.product.pk: quantity})
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 50)
@@ -3,9 +3,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
+    BroadcastListView,
+    BroadcastMarkReadView,
     CategoryBannerListView,
     CreateFullOrderView,
+    HomeFeedView,
     NotificationListView,
+    NotificationMarkReadView,
+    NotificationUnreadCountView,
     OrderProductView,
     PrisonerViewSet,
     ProductCategoryViewSet,
@@ -27,6 +32,7 @@ router.register(r'orders', OrderViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('home/', HomeFeedView.as_view(), name='home'),
     path('order-product/',
          OrderProductView.as_view(), name='order-product'),
     path('create-full-order/', CreateFullOrderView.as_view(),
@@ -37,4 +43,11 @@ urlpatterns = [
          OrderItemViewSet.as_view({'get': 'retrieve'}), name='order-item-detail'),
     path('notifications/', NotificationListView.as_view(),
          name='notification-list'),
+    path('notifications/unread-count/', NotificationUnreadCountView.as_view(),
+         name='notification-unread-count'),
+    path('notifications/read/', NotificationMarkReadView.as_view(),
+         name='notification-mark-read'),
+    path('broadcasts/', BroadcastListView.as_view(), name='broadcast-list'),
+    path('broadcasts/read/', BroadcastMarkReadView.as_view(),
+         name='broadcast-mark-read'),
 ]
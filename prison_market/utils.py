@@ -1,15 +1,49 @@
+import base64
+import binascii
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
-import requests
 from rest_framework.response import Response
 from django.core.paginator import Paginator
 from django.core.exceptions import ValidationError
 from PIL import Image
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.core.paginator import Paginator, EmptyPage, Page, PageNotAnInteger
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
 from prisunion import settings
+from prisunion.http import session
+from prison_market.caching import CATALOG_PARAMS, cached_response, get_model_versions
+from prison_market.conditional import (
+    catalog_validators,
+    conditional_response,
+    instance_validators,
+    queryset_validators,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# How paginate_queryset computes ``total``: "exact" runs COUNT(*) every time,
+# "cached" caches the exact count per filter signature for a short TTL and
+# "estimated" uses planner statistics once the table is large (PostgreSQL).
+PAGINATION_COUNT_STRATEGY = getattr(
+    settings, 'PAGINATION_COUNT_STRATEGY', 'exact')
+# The strategy for the large product catalog listings and search, where a
+# slightly stale or estimated total is acceptable.
+CATALOG_COUNT_STRATEGY = getattr(
+    settings, 'CATALOG_COUNT_STRATEGY', 'cached')
+PAGINATION_COUNT_TIMEOUT = getattr(settings, 'PAGINATION_COUNT_TIMEOUT', 30)
+PAGINATION_ESTIMATE_THRESHOLD = getattr(
+    settings, 'PAGINATION_ESTIMATE_THRESHOLD', 100000)
 
 
 def standardResponse(status, message, data, pagination=None, http_status=None):
@@ -24,11 +58,153 @@ def standardResponse(status, message, data, pagination=None, http_status=None):
     return Response(response)
 
 
-def paginate_queryset(queryset, request):
-    page_number = int(request.query_params.get('page', 1))
+def parse_ids(ids):
+    """
+    :return: ``ids`` if it is a list of integer IDs, otherwise None.
+    """
+    if not isinstance(ids, list):
+        return None
+    if not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids):
+        return None
+    return ids
+
+
+def encode_cursor(position, direction):
+    raw = json.dumps({'pk': position, 'direction': direction})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    if data['direction'] not in ('next', 'previous'):
+        raise ValueError(f"Unknown cursor direction {data['direction']}")
+    return int(data['pk']), data['direction']
+
+
+def row_pk(row):
+    # Rows are model instances, or dicts when the queryset uses values().
+    return row['id'] if isinstance(row, dict) else row.pk
+
+
+def paginate_by_cursor(queryset, request, page_size):
+    """
+    Keyset pagination on the ``-id`` ordering used by the list endpoints.
+
+    Pages are fetched with ``pk < cursor`` / ``pk > cursor`` seeks instead of
+    ``OFFSET``, and no ``COUNT(*)`` is run, so the cost of a page does not grow
+    with its depth. ``total`` and ``total_pages`` are therefore not returned.
+    """
+    cursor = request.query_params.get('cursor')
+    position, direction = None, 'next'
+    if cursor:
+        try:
+            position, direction = decode_cursor(cursor)
+        except (ValueError, KeyError, TypeError, binascii.Error):
+            return [], standardResponse(status="error", message="Invalid cursor.", data={}, http_status=400)
+
+    if direction == 'previous':
+        rows = list(queryset.filter(pk__gt=position).order_by('pk')[:page_size + 1])
+        has_previous = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        has_next = True
+    else:
+        if position is not None:
+            queryset = queryset.filter(pk__lt=position)
+        rows = list(queryset.order_by('-pk')[:page_size + 1])
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        has_previous = position is not None
+
+    pagination_data = {
+        'page_size': page_size,
+        'next': has_next,
+        'previous': has_previous,
+        'next_cursor': encode_cursor(row_pk(rows[-1]), 'next') if rows and has_next else None,
+        'previous_cursor': encode_cursor(row_pk(rows[0]), 'previous') if rows and has_previous else None,
+    }
+
+    return rows, pagination_data
+
+
+def estimate_count(queryset):
+    """
+    Returns the planner's row estimate for ``queryset``, or None when the
+    table is small enough (or the backend unsupported) for an exact count.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+            [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+        if row is None or row[0] < PAGINATION_ESTIMATE_THRESHOLD:
+            return None
+
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def count_queryset(queryset, strategy=None):
+    """
+    Counts ``queryset`` according to ``strategy`` (defaults to the
+    PAGINATION_COUNT_STRATEGY setting).
+
+    :return: A ``(total, is_estimate)`` tuple.
+    """
+    strategy = strategy or PAGINATION_COUNT_STRATEGY
+    if strategy == 'exact':
+        return queryset.count(), False
+
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return 0, False
+
+    if strategy == 'estimated':
+        estimate = estimate_count(queryset)
+        if estimate is not None:
+            return estimate, True
+
+    # The model's catalog version is part of the key, so a save or delete
+    # that invalidates the cached responses also invalidates their counts.
+    version = get_model_versions((queryset.model,))[0]
+    signature = f"{queryset.db}:{version}:{sql}:{params!r}"
+    key = f"pagination:count:{hashlib.md5(signature.encode()).hexdigest()}"
+    total = cache.get(key)
+    if total is None:
+        total = queryset.count()
+        cache.set(key, total, timeout=PAGINATION_COUNT_TIMEOUT)
+    return total, False
+
+
+def paginate_queryset(queryset, request, count_strategy=None):
+    """
+    Paginates ``queryset`` by ``page``/``size`` query params.
+
+    Passing a ``cursor`` query param (empty for the first page) switches to
+    keyset pagination, see ``paginate_by_cursor``. ``count_strategy``
+    overrides how ``total`` is computed, see ``count_queryset``.
+    """
     page_size = int(request.query_params.get('size', 10))
+    if 'cursor' in request.query_params:
+        return paginate_by_cursor(queryset, request, page_size)
+
+    page_number = int(request.query_params.get('page', 1))
 
     paginator = Paginator(queryset, page_size)
+    # Paginator.count is a cached_property, so it can be primed here.
+    paginator.count, is_estimate = count_queryset(queryset, count_strategy)
+    if is_estimate:
+        return paginate_estimated(queryset, paginator, page_number, page_size)
     try:
         paginated_queryset = paginator.page(page_number)
     except EmptyPage:
@@ -38,6 +214,7 @@ def paginate_queryset(queryset, request):
 
     pagination_data = {
         'total': paginator.count,
+        'total_is_estimate': is_estimate,
         'page_size': page_size,
         'current_page': page_number,
         'total_pages': paginator.num_pages,
@@ -48,10 +225,41 @@ def paginate_queryset(queryset, request):
     return paginated_queryset, pagination_data
 
 
+def paginate_estimated(queryset, paginator, page_number, page_size):
+    """
+    Pagination with an estimated total. The estimate may undercount, so pages
+    past it are not rejected, and ``next`` comes from fetching one extra row.
+    """
+    if page_number < 1:
+        return [], standardResponse(status="error", message="Invalid page number.", data={})
+
+    bottom = (page_number - 1) * page_size
+    rows = list(queryset[bottom:bottom + page_size + 1])
+    paginated_queryset = Page(rows[:page_size], page_number, paginator)
+
+    pagination_data = {
+        'total': paginator.count,
+        'total_is_estimate': True,
+        'page_size': page_size,
+        'current_page': page_number,
+        'total_pages': max(paginator.num_pages, page_number),
+        'next': len(rows) > page_size,
+        'previous': page_number > 1,
+    }
+    return paginated_queryset, pagination_data
+
+
 class BaseViewSet(viewsets.ModelViewSet):
     """
     A base viewset that provides default CRUD operations.
+
+    Set ``cache_namespace`` and ``cache_models`` to serve ``list`` through the
+    catalog response cache. ``list`` and ``retrieve`` answer conditional GETs
+    with ``304 Not Modified``.
     """
+    cache_namespace = None
+    cache_models = ()
+    cache_params = CATALOG_PARAMS
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -70,10 +278,31 @@ class BaseViewSet(viewsets.ModelViewSet):
         }, status=status.HTTP_400_BAD_REQUEST)
 
     def list(self, request, *args, **kwargs):
+        etag, last_modified = self.get_list_validators(request)
+        return conditional_response(
+            request, lambda: self.get_list_response(request), etag, last_modified)
+
+    def get_list_validators(self, request):
+        if self.cache_namespace:
+            return catalog_validators(
+                self.cache_namespace, request, self.cache_models, self.cache_params)
+        return queryset_validators(self.filter_queryset(self.get_queryset()), request)
+
+    def get_list_response(self, request):
+        if self.cache_namespace:
+            return cached_response(
+                self.cache_namespace, request, self.cache_models,
+                lambda: self.build_list_response(request),
+                params=self.cache_params)
+        return self.build_list_response(request)
+
+    def build_list_response(self, request):
         queryset = self.filter_queryset(self.get_queryset())
         # Use the custom paginate_queryset function
         paginated_queryset, pagination_data = paginate_queryset(
             queryset, request)
+        if isinstance(pagination_data, Response):
+            return pagination_data
 
         serializer = self.get_serializer(paginated_queryset, many=True)
 
@@ -82,6 +311,11 @@ class BaseViewSet(viewsets.ModelViewSet):
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
+        etag, last_modified = instance_validators(instance)
+        return conditional_response(
+            request, lambda: self.build_retrieve_response(instance), etag, last_modified)
+
+    def build_retrieve_response(self, instance):
         serializer = self.get_serializer(instance)
         serialized_data = serializer.data
 
@@ -93,7 +327,40 @@ class BaseViewSet(viewsets.ModelViewSet):
         return self.retrieve(request, **kwargs)
 
 
-def send_notification(user_ids=None, message=None, all_users=False, additional_data=None):
+ONESIGNAL_CHUNK_SIZE = getattr(settings, 'ONESIGNAL_CHUNK_SIZE', 2000)
+ONESIGNAL_WORKERS = getattr(settings, 'ONESIGNAL_WORKERS', 4)
+ONESIGNAL_TIMEOUT = getattr(settings, 'ONESIGNAL_TIMEOUT', (3.05, 10))
+
+push_executor = ThreadPoolExecutor(
+    max_workers=ONESIGNAL_WORKERS, thread_name_prefix='onesignal')
+
+
+def post_notification_chunk(index, payload, headers):
+    recipients = len(payload.get("include_external_user_ids", [])) or None
+    try:
+        response = session.post(
+            settings.ONE_SIGNAL_NOTIFICATION_URL, headers=headers, json=payload,
+            timeout=ONESIGNAL_TIMEOUT)
+        result = response.json()
+        ok = response.status_code == 200 and not result.get("errors")
+    except (requests.RequestException, ValueError) as e:
+        result, ok = {"errors": [str(e)]}, False
+    if not ok:
+        logger.error(f"OneSignal chunk {index} failed: {result}")
+    return {"chunk": index, "recipients": recipients, "ok": ok, "response": result}
+
+
+def dispatch_notification(user_ids=None, message=None, all_users=False, additional_data=None):
+    """
+    Queues a push notification without waiting for OneSignal.
+
+    Recipients are split into chunks of ONESIGNAL_CHUNK_SIZE external user
+    IDs (OneSignal's per-request limit) and the chunks are posted concurrently
+    over the shared session. A broadcast to all users is a single segment call.
+
+    :return: A list of futures, one per chunk, each resolving to a dict with
+        the chunk index, recipient count, ``ok`` and the OneSignal response.
+    """
     headers = {
         "Content-Type": "application/json; charset=utf-8",
         "Authorization": f"Basic {settings.ONESIGNAL_REST_API_KEY}"
@@ -107,13 +374,28 @@ def send_notification(user_ids=None, message=None, all_users=False, additional_d
 
     # Targeting specific users or all users
     if all_users:
-        payload["included_segments"] = ["All"]
+        payloads = [dict(payload, included_segments=["All"])]
     elif user_ids:
-        payload["include_external_user_ids"] = user_ids
+        if isinstance(user_ids, str):
+            user_ids = [user_ids]
+        user_ids = list(dict.fromkeys(user_ids))
+        payloads = [
+            dict(payload, include_external_user_ids=user_ids[start:start + ONESIGNAL_CHUNK_SIZE])
+            for start in range(0, len(user_ids), ONESIGNAL_CHUNK_SIZE)
+        ]
     else:
         raise ValueError(
             "You must specify either user_ids or set all_users=True")
 
-    response = requests.post(
-        settings.ONE_SIGNAL_NOTIFICATION_URL, headers=headers, json=payload)
-    return response.json()
+    return [push_executor.submit(post_notification_chunk, index, chunk, headers)
+            for index, chunk in enumerate(payloads)]
+
+
+def send_notification(user_ids=None, message=None, all_users=False, additional_data=None):
+    """
+    Sends a push notification and waits for every chunk.
+
+    :return: The per-chunk results of ``dispatch_notification``.
+    """
+    futures = dispatch_notification(user_ids, message, all_users, additional_data)
+    return [future.result() for future in futures]
@@ -1,7 +1,5 @@
 from django.shortcuts import render
-from datetime import date
 from django.utils.timezone import now
-from django.db.models import Sum
 from rest_framework import viewsets
 from logs_bot.utils import notify_new_order
 from prison_market.models import (
@@ -16,6 +14,7 @@ from prison_market.models import (
 
 from prison_market.serializers import (
     CategoryBannerSerializer,
+    OrderHistorySerializer,
     OrderItemSerializer,
     OrderSerializer,
     PrisonerSerializer,
@@ -25,16 +24,43 @@ from prison_market.serializers import (
     ProductListSerializer,
     PrisonerContactTokenObtainPairSerializer
 )
+from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from prison_market.utils import BaseViewSet, paginate_queryset, standardResponse
-from rest_framework.generics import CreateAPIView, RetrieveAPIView, ListAPIView
+from prison_market.broadcasts import broadcasts_for, get_unread_broadcast_count, mark_broadcasts_read
+from prison_market.caching import CATALOG_PARAMS, cached_response
+from prison_market.conditional import catalog_validators, conditional_response, instance_validators
+from prison_market.fast_serializers import (
+    ORDER_FIELDS,
+    ORDER_ITEM_FIELDS,
+    PRODUCT_LIST_FIELDS,
+    serialize_order_items,
+    serialize_orders,
+    serialize_products,
+)
+from prison_market.idempotency import idempotent
+from prison_market.inbox import get_unread_count, mark_read
+from prison_market.ledger import (
+    MAX_DAILY_WEIGHT, DailyLimitExceeded, get_remaining_allowance, record_order_items)
+from prison_market.stock import InsufficientStock, reserve_stock
+from prison_market.utils import (
+    CATALOG_COUNT_STRATEGY, BaseViewSet, paginate_by_cursor, paginate_queryset, parse_ids,
+    standardResponse)
+from rest_framework.generics import CreateAPIView, RetrieveAPIView
 from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 from .models import Notification
-from .serializers import NotificationSerializer
-from django.db.models import Q
+from .serializers import BroadcastSerializer, NotificationSerializer
+from django.db.models import Prefetch, Q
+from rest_framework.decorators import action
+from django.conf import settings
+
+
+HOME_CATEGORY_LIMIT = getattr(settings, 'HOME_CATEGORY_LIMIT', 20)
+HOME_BANNER_LIMIT = getattr(settings, 'HOME_BANNER_LIMIT', 10)
+HOME_TRENDING_LIMIT = getattr(settings, 'HOME_TRENDING_LIMIT', 10)
 
 
 class PrisonerViewSet(BaseViewSet):
@@ -46,6 +72,9 @@ class ProductCategoryViewSet(BaseViewSet):
     queryset = ProductCategory.objects.all().order_by("-id")
     serializer_class = ProductCategorySerializer
     http_method_names = ['get']
+    cache_namespace = 'categories'
+    cache_models = (ProductCategory,)
+    cache_params = ('page', 'size', 'cursor')
 
 
 class CategoryProductsViewSet(BaseViewSet):
@@ -63,14 +92,24 @@ class CategoryProductsViewSet(BaseViewSet):
             return super().get_serializer_class()
 
     def list(self, request, category_id=None):
+        params = ('page', 'size', 'cursor')
+        extra = {'category_id': category_id}
+        etag, last_modified = catalog_validators(
+            'category-products', request, (Product,), params, extra)
+        return conditional_response(request, lambda: cached_response(
+            'category-products', request, (Product,),
+            lambda: self.build_list_response(request, category_id),
+            params=params, extra=extra), etag, last_modified)
+
+    def build_list_response(self, request, category_id=None):
         queryset = Product.objects.filter(
-            category_id=category_id).order_by('-id')
+            category_id=category_id).order_by('-id').values(*PRODUCT_LIST_FIELDS)
         paginated_queryset, pagination_data = paginate_queryset(
-            queryset, request)
-        print(self.serializer_class)
-        serializer = self.serializer_class(
-            paginated_queryset, many=True, context={'request': request})
-        return standardResponse(status="success", message="Items retrieved", data=serializer.data, pagination=pagination_data)
+            queryset, request, count_strategy=CATALOG_COUNT_STRATEGY)
+        if isinstance(pagination_data, Response):
+            return pagination_data
+        data = serialize_products(paginated_queryset, request)
+        return standardResponse(status="success", message="Items retrieved", data=data, pagination=pagination_data)
 
     def retrieve(self, request, pk=None, category_id=None):
         try:
@@ -78,6 +117,11 @@ class CategoryProductsViewSet(BaseViewSet):
         except Product.DoesNotExist:
             return standardResponse(status="error", message="Product not found", data={}, pagination={})
 
+        etag, last_modified = instance_validators(product)
+        return conditional_response(
+            request, lambda: self.build_retrieve_response(product), etag, last_modified)
+
+    def build_retrieve_response(self, product):
         serializer = self.serializer_class(product)
         return standardResponse(status="success", message="Item retrieved", data=serializer.data, pagination={})
 
@@ -94,31 +138,40 @@ class ProductViewSet(BaseViewSet):
             return ProductDetailSerializer
         return ProductListSerializer
 
-    def list(self, request, *args, **kwargs):
+    def get_list_validators(self, request):
+        return catalog_validators('products', request, (Product,), CATALOG_PARAMS)
+
+    def get_list_response(self, request):
+        return cached_response(
+            'products', request, (Product,),
+            lambda: self.build_list_response(request))
 
-        genre_from_param = request.query_params.get('genre', None)
+    def build_list_response(self, request):
         trending_from_param = request.query_params.get('trending', None)
         category_from_param = request.query_params.get('category', None)
 
         queryset = self.get_queryset()
 
         filter_conditions = Q()
-        if genre_from_param:
-            filter_conditions &= Q(genre_id=genre_from_param)
         if trending_from_param is not None:
             trending_bool = trending_from_param.lower() in ['true', '1', 't']
             filter_conditions &= Q(is_trending=trending_bool)
         if category_from_param:
             filter_conditions &= Q(category_id=category_from_param)
 
-        queryset = queryset.filter(filter_conditions)
+        queryset = queryset.filter(filter_conditions).values(*PRODUCT_LIST_FIELDS)
 
         paginated_queryset, pagination_data = paginate_queryset(
-            queryset, request)
+            queryset, request, count_strategy=CATALOG_COUNT_STRATEGY)
 
-        serializer = self.get_serializer(paginated_queryset, many=True)
+        if isinstance(pagination_data, Response):
 
-        return standardResponse(status="success", message="Items retrieved", data=serializer.data, pagination=pagination_data)
+
+            return pagination_data
+
+        data = serialize_products(paginated_queryset, request)
+
+        return standardResponse(status="success", message="Items retrieved", data=data, pagination=pagination_data)
 
 
 class OrderViewSet(BaseViewSet):
@@ -134,14 +187,37 @@ class OrderViewSet(BaseViewSet):
         return OrderSerializer
 
     def list(self, request, *args, **kwargs):
-        user = request.user
-        prisoner_contact_obj = PrisonerContact.objects.get(user=user.id)
         queryset = self.get_queryset().filter(
-            ordered_by=prisoner_contact_obj.id)
+            ordered_by__user=request.user).values(*ORDER_FIELDS)
         paginated_queryset, pagination_data = paginate_queryset(
             queryset, request)
+        if isinstance(pagination_data, Response):
+            return pagination_data
+
+        data = serialize_orders(paginated_queryset, request)
+
+        return standardResponse(status="success", message="Items retrieved", data=data, pagination=pagination_data)
 
-        serializer = self.get_serializer(paginated_queryset, many=True)
+    @action(detail=False, methods=['get'])
+    def history(self, request, *args, **kwargs):
+        """
+        The user's orders with items, product summaries and the prisoner name
+        embedded, so the history screen needs no per-order requests. A page
+        costs a fixed number of queries: the count, the orders and the items.
+        """
+        queryset = self.get_queryset().filter(
+            ordered_by__user=request.user,
+        ).select_related('prisoner').prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related(
+                'product').order_by('id')),
+        )
+        paginated_queryset, pagination_data = paginate_queryset(
+            queryset, request)
+        if isinstance(pagination_data, Response):
+            return pagination_data
+
+        serializer = OrderHistorySerializer(
+            paginated_queryset, many=True, context={'request': request})
 
         return standardResponse(status="success", message="Items retrieved", data=serializer.data, pagination=pagination_data)
 
@@ -158,15 +234,14 @@ class OrderItemViewSet(viewsets.ReadOnlyModelViewSet):
 
     def list(self, request, *args, **kwargs):
         # Customizing the list action to use the standardResponse.
-        queryset = self.filter_queryset(self.get_queryset())
+        queryset = self.filter_queryset(
+            self.get_queryset()).values(*ORDER_ITEM_FIELDS)
 
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+            return self.get_paginated_response(serialize_order_items(page, request))
 
-        serializer = self.get_serializer(queryset, many=True)
-        return standardResponse(status="success", message="Items retrieved", data=serializer.data)
+        return standardResponse(status="success", message="Items retrieved", data=serialize_order_items(queryset, request))
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -177,29 +252,33 @@ class OrderItemViewSet(viewsets.ReadOnlyModelViewSet):
 class OrderProductView(CreateAPIView):
     serializer_class = OrderItemSerializer
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         contact = PrisonerContact.objects.get(pk=1)
 
         prisoner = self.get_prisoner(request.data.get('prisoner_id'))
 
-        # Check remaining quantity for the prisoner and get the product
-        remaining_weight_today = self.get_remaining_weight(prisoner)
         product = self.get_product(request.data.get('product_id'))
-        quantity = request.data.get('quantity')
-        total_weight_of_order = product.weight * quantity
-
-        # Validate total weight of the order
-        if total_weight_of_order > remaining_weight_today:
-            return standardResponse(status="error", message=f"Exceeds the daily weight limit. You can order up to {remaining_weight_today} kg today for this prisoner.", data={})
-        if product.stock < quantity:
+        try:
+            quantity = int(request.data.get('quantity'))
+        except (TypeError, ValueError):
+            quantity = None
+        if quantity is None or quantity < 1:
+            return standardResponse(status="error", message="Quantity must be a positive integer.", data={}, http_status=400)
+
+        # Reserve stock, check and record the daily allowance, and create the
+        # order and order item within a transaction
+        try:
+            with transaction.atomic():
+                reserve_stock({product.pk: quantity})
+                record_order_items(prisoner, [(product, quantity)], max_weight=MAX_DAILY_WEIGHT)
+                order = self.create_or_get_order(prisoner, contact)
+                order_item = self.create_order_item(order, product, quantity)
+                self.update_order_total(order)
+        except InsufficientStock:
             return standardResponse(status="error", message="Insufficient stock for the product.", data={})
-
-        # Create order and order item within a transaction
-        with transaction.atomic():
-            order = self.create_or_get_order(prisoner, contact)
-            order_item = self.create_order_item(order, product, quantity)
-            self.update_product_stock(product, quantity)
-            self.update_order_total(order)
+        except DailyLimitExceeded as e:
+            return standardResponse(status="error", message=f"Exceeds the daily weight limit. You can order up to {e.remaining_weight} kg today for this prisoner.", data={})
 
         # Serialize and return the order
         order_serializer = OrderSerializer(order)
@@ -213,32 +292,12 @@ class OrderProductView(CreateAPIView):
         return get_object_or_404(Prisoner, pk=1)
 
     def get_remaining_quantity(self, prisoner):
-        today = date.today()
-        existing_orders = Order.objects.filter(
-            prisoner=prisoner,
-            created_at__date=today  # Use 'created_at__date' instead of 'ordered_date__date'
-        )
-        total_ordered_quantity_today = sum(
-            order.items.aggregate(total_quantity=Sum('quantity'))[
-                'total_quantity'] or 0
-            for order in existing_orders
-        )
-        max_quantity_today = 12
-        return max_quantity_today - total_ordered_quantity_today
+        _, remaining_quantity = get_remaining_allowance(prisoner)
+        return remaining_quantity
 
     def get_remaining_weight(self, prisoner):
-        today = date.today()
-        existing_orders = Order.objects.filter(
-            prisoner=prisoner,
-            created_at__date=today
-        )
-        total_ordered_weight_today = sum(
-            order_item.product.weight * order_item.quantity
-            for order in existing_orders
-            for order_item in order.items.all()
-        )
-        max_weight_today = 12
-        return max_weight_today - total_ordered_weight_today
+        remaining_weight, _ = get_remaining_allowance(prisoner)
+        return remaining_weight
 
     def get_product(self, product_id):
         return get_object_or_404(Product, pk=product_id)
@@ -262,10 +321,6 @@ class OrderProductView(CreateAPIView):
         order.items.add(order_item)
         return order_item
 
-    def update_product_stock(self, product, quantity):
-        product.stock -= quantity
-        product.save()
-
     def update_order_total(self, order):
         order.total = sum(
             item.price_at_time_of_order for item in order.items.all())
@@ -286,6 +341,7 @@ class CreateFullOrderView(APIView):
     API endpoint for creating a full order with multiple products for a prisoner by a contact.
     """
 
+    @idempotent
     def post(self, request, *args, **kwargs):
         prisoner_id = request.data.get('prisoner_id')
         contact_id = request.data.get('contact_id')
@@ -297,68 +353,202 @@ class CreateFullOrderView(APIView):
         if not products_info or not isinstance(products_info, list):
             return standardResponse(status="error", message="Invalid products list.", data={})
 
-        with transaction.atomic():
-            order = self.create_order(prisoner, contact)
-
-            for product_info in products_info:
-                product_id = product_info.get('product_id')
-                quantity = product_info.get('quantity')
+        lines = []
+        quantities = {}
+        for product_info in products_info:
+            try:
+                product_id = int(product_info.get('product_id'))
+                quantity = int(product_info.get('quantity'))
+            except (TypeError, ValueError):
+                product_id = quantity = None
 
-                if not product_id or not quantity:
-                    # Rollback transaction and return error response
-                    transaction.set_rollback(True)
-                    return standardResponse(status="error", message="Product ID and quantity are required for each item.", data={})
+            if not product_id or not quantity:
+                return standardResponse(status="error", message="Product ID and quantity are required for each item.", data={}, http_status=400)
+            if quantity < 1:
+                return standardResponse(status="error", message="Quantity must be a positive integer.", data={}, http_status=400)
 
-                product = get_object_or_404(Product, pk=product_id)
-                if product.stock < quantity:
-                    transaction.set_rollback(True)
-                    return standardResponse(status="error", message=f"Insufficient stock for product ID {product_id}.", data={})
+            lines.append((product_id, quantity))
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
 
-                self.create_order_item(order, product, quantity)
-
-            self.update_order_total(order)
+        try:
+            with transaction.atomic():
+                # Products are fetched, locked and checked in one query and
+                # their stock is decremented in one statement, so a shortfall
+                # on any line fails the order before it is created.
+                products = reserve_stock(quantities)
+                order_lines = [(products[product_id], quantity)
+                               for product_id, quantity in lines]
+
+                record_order_items(prisoner, order_lines)
+
+                order = self.create_order(
+                    prisoner, contact, self.calculate_total(order_lines))
+                self.create_order_items(order, order_lines)
+        except Product.DoesNotExist:
+            raise Http404("No Product matches the given query.")
+        except InsufficientStock as e:
+            return standardResponse(status="error", message=f"Insufficient stock for product ID {e.product_id}.", data={})
 
         serializer = OrderSerializer(order)
         return standardResponse(status="success", message="Order placed successfully", data=serializer.data)
 
-    def create_order(self, prisoner, contact):
+    def create_order(self, prisoner, contact, total):
         # Create a new order
         order = Order.objects.create(
             prisoner=prisoner,
             ordered_by=contact,
-            status='Pending'
+            status='Pending',
+            total=total
         )
         return order
 
-    def create_order_item(self, order, product, quantity):
-        # Create an order item and associate it with the order
-        order_item = OrderItem.objects.create(
-            order=order,
-            product=product,
-            quantity=quantity,
-            price_at_time_of_order=product.price
-        )
-        order.items.add(order_item)
-        product.stock -= quantity
-        product.save()
+    def create_order_items(self, order, order_lines):
+        # Create all order items of the order in a single INSERT
+        return OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=product,
+                quantity=quantity,
+                price_at_time_of_order=product.price
+            )
+            for product, quantity in order_lines
+        ])
 
-    def update_order_total(self, order):
-        # Recalculate the order total based on the order items
-        order.total = sum(
-            item.quantity * item.price_at_time_of_order for item in order.items.all()
-        )
-        order.save()
+    def calculate_total(self, order_lines):
+        # The order total from the prices the items are created with
+        return sum(product.price * quantity for product, quantity in order_lines)
 
 
 class CategoryBannerListView(BaseViewSet):
     queryset = CategoryBanner.objects.all().order_by('-id')
     serializer_class = CategoryBannerSerializer
+    cache_namespace = 'banners'
+    cache_models = (CategoryBanner, ProductCategory)
+    cache_params = ('page', 'size', 'cursor')
 
 
-class NotificationListView(ListAPIView):
-    serializer_class = NotificationSerializer
+class HomeFeedView(APIView):
+    """
+    Categories, banners and trending products for the app's home screen in a
+    single response, built with one query per section and cached as a unit.
+    """
+    cache_models = (Product, ProductCategory, CategoryBanner)
+
+    def get(self, request):
+        etag, last_modified = catalog_validators(
+            'home', request, self.cache_models, ())
+        return conditional_response(request, lambda: cached_response(
+            'home', request, self.cache_models,
+            lambda: self.build_response(request), params=()), etag, last_modified)
+
+    def build_response(self, request):
+        context = {'request': request}
+        categories = ProductCategory.objects.order_by('-id')[:HOME_CATEGORY_LIMIT]
+        banners = CategoryBanner.objects.order_by('-id')[:HOME_BANNER_LIMIT]
+        trending = Product.objects.filter(is_trending=True).order_by(
+            '-id').values(*PRODUCT_LIST_FIELDS)[:HOME_TRENDING_LIMIT]
+
+        data = {
+            'categories': ProductCategorySerializer(categories, many=True, context=context).data,
+            'banners': CategoryBannerSerializer(banners, many=True, context=context).data,
+            'trending': serialize_products(trending, request),
+        }
+        return standardResponse(status="success", message="Home feed retrieved", data=data)
+
+
+class NotificationListView(APIView):
+    """
+    The authenticated contact's inbox, newest first, with cursor pagination
+    (``?cursor=`` for the first page) and the cached unread count.
+    """
     permission_classes = [IsAuthenticated]
 
-    def get_queryset(self):
-        user = self.request.user
-        return Notification.objects.filter(recipient=user).order_by('-created_at')
+    def get(self, request, *args, **kwargs):
+        contact = PrisonerContact.objects.filter(user=request.user).only('id').first()
+        if contact is None:
+            return standardResponse(status="error", message="Prisoner contact not found.", data=[], http_status=404)
+
+        page_size = int(request.query_params.get('size', 10))
+        notifications, pagination = paginate_by_cursor(
+            Notification.objects.filter(recipient_id=contact.id), request, page_size)
+        if isinstance(pagination, Response):
+            return pagination
+        pagination['unread_count'] = get_unread_count(contact.id)
+        serializer = NotificationSerializer(notifications, many=True)
+        return standardResponse(status="success", message="Notifications retrieved", data=serializer.data, pagination=pagination)
+
+
+class NotificationUnreadCountView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        contact = PrisonerContact.objects.filter(user=request.user).only('id').first()
+        if contact is None:
+            return standardResponse(status="error", message="Prisoner contact not found.", data={}, http_status=404)
+        return standardResponse(status="success", message="Unread count retrieved", data={
+            'unread_count': get_unread_count(contact.id),
+            'broadcast_unread_count': get_unread_broadcast_count(contact.id),
+        })
+
+
+class NotificationMarkReadView(APIView):
+    """
+    Marks the given notification ``ids`` as read, or all of them when no
+    ``ids`` are sent.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        contact = PrisonerContact.objects.filter(user=request.user).only('id').first()
+        if contact is None:
+            return standardResponse(status="error", message="Prisoner contact not found.", data={}, http_status=404)
+
+        ids = request.data.get('ids')
+        if ids is not None:
+            ids = parse_ids(ids)
+            if ids is None:
+                return standardResponse(status="error", message="ids must be a list of notification IDs.", data={}, http_status=400)
+
+        marked = mark_read(contact.id, ids)
+        return standardResponse(status="success", message="Notifications marked as read", data={'marked': marked, 'unread_count': get_unread_count(contact.id)})
+
+
+
+class BroadcastListView(APIView):
+    """
+    Announcements sent to every contact, newest first, with the caller's read
+    state. Uses cursor pagination like the inbox.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        contact = PrisonerContact.objects.filter(user=request.user).only('id').first()
+        if contact is None:
+            return standardResponse(status="error", message="Prisoner contact not found.", data=[], http_status=404)
+
+        page_size = int(request.query_params.get('size', 10))
+        broadcasts, pagination = paginate_by_cursor(
+            broadcasts_for(contact.id), request, page_size)
+        if isinstance(pagination, Response):
+            return pagination
+        pagination['unread_count'] = get_unread_broadcast_count(contact.id)
+        serializer = BroadcastSerializer(broadcasts, many=True)
+        return standardResponse(status="success", message="Broadcasts retrieved", data=serializer.data, pagination=pagination)
+
+
+class BroadcastMarkReadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        contact = PrisonerContact.objects.filter(user=request.user).only('id').first()
+        if contact is None:
+            return standardResponse(status="error", message="Prisoner contact not found.", data={}, http_status=404)
+
+        ids = request.data.get('ids')
+        if ids is not None:
+            ids = parse_ids(ids)
+            if ids is None:
+                return standardResponse(status="error", message="ids must be a list of broadcast IDs.", data={}, http_status=400)
+
+        marked = mark_broadcasts_read(contact.id, ids)
+        return standardResponse(status="success", message="Broadcasts marked as read", data={'marked': marked, 'unread_count': get_unread_broadcast_count(contact.id)})
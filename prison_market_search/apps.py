@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class PrisonMarketSearchConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'prison_market_search'
+
+    def ready(self):
+        from prison_market_search.backends import set_trigram_threshold
+
+        post_migrate.connect(create_search_indexes_after_migrate, sender=self)
+        connection_created.connect(set_trigram_threshold,
+                                   dispatch_uid="search_trigram_threshold")
+
+
+def create_search_indexes_after_migrate(sender, using='default', **kwargs):
+    from prison_market_search.backends import create_search_indexes
+    create_search_indexes(using)
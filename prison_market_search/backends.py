@@ -0,0 +1,221 @@
+import logging
+import math
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.lookups import TrigramSimilar
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connections
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+from prison_market.caching import get_model_versions
+from prison_market.models import Product
+
+
+logger = logging.getLogger(__name__)
+
+# Text search configuration; 'simple' does no stemming, which suits mixed
+# Uzbek/Russian/English product names.
+SEARCH_CONFIG = getattr(settings, 'SEARCH_CONFIG', 'simple')
+# Minimum pg_trgm similarity for a fuzzy name match (typos, partial words).
+SEARCH_TRIGRAM_THRESHOLD = getattr(settings, 'SEARCH_TRIGRAM_THRESHOLD', 0.3)
+# The in-process fallback ranks at most this many products per query.
+SEARCH_FALLBACK_LIMIT = getattr(settings, 'SEARCH_FALLBACK_LIMIT', 1000)
+
+NAME_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+
+SEARCH_VECTOR_INDEX = 'product_search_vector_idx'
+NAME_TRIGRAM_INDEX = 'product_name_trgm_idx'
+# pg_trgm's default threshold for the % operator.
+DEFAULT_TRIGRAM_THRESHOLD = 0.3
+
+
+def product_vector():
+    # The GIN index is built from the same expression, so that PostgreSQL can
+    # match it to the query.
+    return (SearchVector('name', config=SEARCH_CONFIG, weight='A')
+            + SearchVector('description', config=SEARCH_CONFIG, weight='B'))
+
+
+def create_search_indexes(using='default'):
+    """
+    Creates the full-text and trigram indexes on PostgreSQL. Does nothing on
+    other backends, which use the in-process index.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        existing = connection.introspection.get_constraints(cursor, Product._meta.db_table)
+
+    with connection.schema_editor() as editor:
+        if SEARCH_VECTOR_INDEX not in existing:
+            editor.add_index(Product, GinIndex(product_vector(), name=SEARCH_VECTOR_INDEX))
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        if NAME_TRIGRAM_INDEX not in existing:
+            with connection.schema_editor() as editor:
+                editor.add_index(Product, GinIndex(
+                    OpClass('name', name='gin_trgm_ops'), name=NAME_TRIGRAM_INDEX))
+    except Exception as e:
+        # Creating extensions may need more privileges than the app has.
+        logger.warning(f"pg_trgm is unavailable, fuzzy name matching is disabled: {e}")
+
+
+trigram_available = {}
+
+
+def has_trigram(connection):
+    # Looked up once per process and database alias.
+    if connection.alias not in trigram_available:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            trigram_available[connection.alias] = cursor.fetchone() is not None
+    return trigram_available[connection.alias]
+
+
+def set_trigram_threshold(sender, connection, **kwargs):
+    """
+    Sets the % operator's threshold once per new database connection, see
+    PrisonMarketSearchConfig.ready().
+    """
+    if connection.vendor != 'postgresql' or SEARCH_TRIGRAM_THRESHOLD == DEFAULT_TRIGRAM_THRESHOLD:
+        return
+    if has_trigram(connection):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT set_config('pg_trgm.similarity_threshold', %s, false)",
+                           [str(SEARCH_TRIGRAM_THRESHOLD)])
+
+
+def postgres_search(queryset, query):
+    connection = connections[queryset.db]
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    rank = SearchRank(product_vector(), search_query, cover_density=True, normalization=1)
+    matches = Q(search_vector=search_query)
+
+    if has_trigram(connection):
+        rank = rank + TrigramSimilarity('name', query)
+        # The % operator (rather than similarity() > threshold) can use the
+        # trigram index.
+        matches |= Q(TrigramSimilar(F('name'), Value(query)))
+
+    return (queryset.alias(search_vector=product_vector())
+            .annotate(search_rank=rank)
+            .filter(matches)
+            .order_by('-search_rank', '-id'))
+
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').casefold())
+
+
+class InvertedIndex:
+    """
+    A token -> {product ID: weight} index over product names and
+    descriptions, for backends without full-text search (SQLite in
+    development). Rebuilt when the Product catalog version changes.
+    """
+
+    def __init__(self, rows):
+        postings = defaultdict(lambda: defaultdict(int))
+        for pk, name, description in rows:
+            for token in tokenize(name):
+                postings[token][pk] += NAME_WEIGHT
+            for token in tokenize(description):
+                postings[token][pk] += DESCRIPTION_WEIGHT
+        self.postings = {token: dict(products) for token, products in postings.items()}
+        self.vocabulary = sorted(self.postings)
+        self.size = len(rows)
+
+    def expand(self, term):
+        """
+        Tokens starting with ``term``, so partially typed words match.
+        """
+        start = bisect_left(self.vocabulary, term)
+        tokens = []
+        for token in self.vocabulary[start:]:
+            if not token.startswith(term):
+                break
+            tokens.append(token)
+        return tokens
+
+    def search(self, query, limit=SEARCH_FALLBACK_LIMIT):
+        """
+        :return: IDs of the products matching every term, best first.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        scores = None
+        for term in terms:
+            term_scores = defaultdict(float)
+            for token in self.expand(term):
+                products = self.postings[token]
+                idf = math.log(1 + self.size / len(products))
+                # Exact words rank above prefix matches.
+                boost = 1.0 if token == term else 0.5
+                for pk, weight in products.items():
+                    term_scores[pk] = max(term_scores[pk], weight * idf * boost)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {pk: score + term_scores[pk]
+                          for pk, score in scores.items() if pk in term_scores}
+            if not scores:
+                return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        return [pk for pk, _ in ranked[:limit]]
+
+
+fallback_index = {'version': None, 'index': None}
+fallback_lock = threading.Lock()
+
+
+def get_fallback_index():
+    version = get_model_versions((Product,))[0]
+    index = fallback_index['index']
+    if index is not None and fallback_index['version'] == version:
+        return index
+
+    with fallback_lock:
+        if fallback_index['index'] is None or fallback_index['version'] != version:
+            rows = list(Product.objects.values_list('id', 'name', 'description'))
+            fallback_index['index'] = InvertedIndex(rows)
+            fallback_index['version'] = version
+        return fallback_index['index']
+
+
+def fallback_search(queryset, query):
+    ids = get_fallback_index().search(query)
+    if not ids:
+        return queryset.none()
+    ordering = Case(*[When(pk=pk, then=Value(position)) for position, pk in enumerate(ids)],
+                    output_field=IntegerField())
+    return queryset.filter(pk__in=ids).order_by(ordering)
+
+
+def search_products(queryset, query):
+    """
+    Filters a Product queryset to the products matching ``query`` in name or
+    description, best matches first (name matches rank above description
+    matches). An empty query returns the queryset newest first.
+    """
+    query = (query or '').strip()
+    if not query:
+        return queryset.order_by('-id')
+    if connections[queryset.db].vendor == 'postgresql':
+        return postgres_search(queryset, query)
+    return fallback_search(queryset, query)
@@ -3,13 +3,31 @@ from django.core.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework import status
 from prison_market.models import Product, ProductCategory
-from prison_market.serializers import ProductListSerializer
+from prison_market.fast_serializers import PRODUCT_LIST_FIELDS, serialize_products
 from rest_framework.views import APIView
-from prison_market.utils import standardResponse, paginate_queryset
+from prison_market.conditional import catalog_validators, conditional_response
+from prison_market.utils import CATALOG_COUNT_STRATEGY, standardResponse, paginate_queryset
+from prison_market_search.backends import search_products
+
+
+SEARCH_PARAMS = ('q', 'category', 'min_weight', 'max_weight',
+                 'min_price', 'max_price', 'page', 'size', 'cursor')
 
 
 class AdvancedSearch(APIView):
+    """
+    Product search over name and description with filters. Results are
+    ranked by relevance when ``q`` is given; note that ``cursor`` pagination
+    pages by ID, so ranked results should be paged with ``page``.
+    """
+
     def get(self, request):
+        etag, last_modified = catalog_validators(
+            'search', request, (Product, ProductCategory), SEARCH_PARAMS)
+        return conditional_response(
+            request, lambda: self.search(request), etag, last_modified)
+
+    def search(self, request):
         # Search and filtering parameters
         query = request.GET.get('q', '')
         category = request.GET.get('category', None)
@@ -18,8 +36,8 @@ class AdvancedSearch(APIView):
         min_price = request.GET.get('min_price', None)
         max_price = request.GET.get('max_price', None)
 
-        # Construct the base query
-        products_query = Q(name__icontains=query)
+        # Construct the base query; the text query is applied by search_products
+        products_query = Q()
 
         # Filter by category if provided
         if category:
@@ -42,15 +60,20 @@ class AdvancedSearch(APIView):
 
         try:
             # Execute the query
-            products = Product.objects.filter(
-                products_query).order_by("-id").distinct()
+            products = search_products(
+                Product.objects.filter(products_query), query).values(*PRODUCT_LIST_FIELDS)
         except ValidationError as e:
             # Handle any potential validation errors, e.g., invalid decimal format
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         paginated_queryset, pagination_data = paginate_queryset(
-            products, request)
+            products, request, count_strategy=CATALOG_COUNT_STRATEGY)
+
+        if isinstance(pagination_data, Response):
+
+
+            return pagination_data
 
-        serializer = ProductListSerializer(paginated_queryset, many=True)
+        data = serialize_products(paginated_queryset, request)
 
-        return standardResponse(status="success", message="Items retrieved", data=serializer.data, pagination=pagination_data)
+        return standardResponse(status="success", message="Items retrieved", data=data, pagination=pagination_data)
@@ -0,0 +1,68 @@
+import hashlib
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+
+OTP_TTL = getattr(settings, 'OTP_TTL', 60 * 5)
+OTP_MAX_ATTEMPTS = getattr(settings, 'OTP_MAX_ATTEMPTS', 5)
+OTP_LENGTH = getattr(settings, 'OTP_LENGTH', 4)
+
+
+def otp_keys(phone_number):
+    digest = hashlib.sha256(str(phone_number).encode()).hexdigest()
+    return f"otp:{digest}", f"otp:{digest}:attempts"
+
+
+def hash_code(phone_number, code):
+    # Only a keyed hash is stored, so cache contents do not reveal codes.
+    return salted_hmac('prisoner_contact_auth.otp', f"{phone_number}:{code}").hexdigest()
+
+
+def issue_code(phone_number):
+    """
+    Generates a new verification code for a phone number, replacing any
+    previous one, valid for OTP_TTL seconds.
+
+    :return: The code to send to the user.
+    """
+    code = str(secrets.randbelow(9 * 10 ** (OTP_LENGTH - 1)) + 10 ** (OTP_LENGTH - 1))
+    code_key, attempts_key = otp_keys(phone_number)
+    cache.set_many({code_key: hash_code(phone_number, code), attempts_key: 0}, timeout=OTP_TTL)
+    return code
+
+
+def discard_code(phone_number):
+    cache.delete_many(otp_keys(phone_number))
+
+
+def verify_code(phone_number, code):
+    """
+    Checks a verification code. A code can be used once, and is discarded
+    after OTP_MAX_ATTEMPTS wrong guesses.
+
+    :return: True if the code is correct.
+    """
+    if not phone_number or not code:
+        return False
+
+    code_key, attempts_key = otp_keys(phone_number)
+    stored = cache.get(code_key)
+    if stored is None:
+        return False
+
+    try:
+        attempts = cache.incr(attempts_key)
+    except ValueError:
+        # The code expired between the two reads.
+        return False
+    if attempts > OTP_MAX_ATTEMPTS:
+        discard_code(phone_number)
+        return False
+
+    if constant_time_compare(stored, hash_code(phone_number, str(code))):
+        discard_code(phone_number)
+        return True
+    return False
@@ -8,7 +8,7 @@ from prison_market.models import PrisonerContact
 from django.contrib.auth.models import User
 from rest_framework.exceptions import ValidationError
 
-from prisoner_contact_auth.utils import ensure_https
+from prison_market.renditions import rendition_url
 
 
 class PrisonerContactTokenObtainPairSerializer(TokenObtainPairSerializer):
@@ -89,12 +89,5 @@ class PrisonerContactSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
     def get_picture(self, obj):
-        if obj.picture:  # Assuming 'picture' is the field name in your model
-            request = self.context.get('request')
-            picture_url = obj.picture.url
-            if request is not None:
-                return ensure_https(request.build_absolute_uri(picture_url))
-            else:
-                # If no request in context, return relative URL or absolute URL using settings if applicable
-                return picture_url
-        return None
+        return rendition_url(obj.picture, self.context.get('rendition', 'medium'),
+                             self.context.get('request'))
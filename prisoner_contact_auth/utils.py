@@ -1,16 +1,34 @@
-import requests
+import threading
+import time
+
 from django.conf import settings
+from django.core.cache import cache
+
+from prisunion.http import session
+from prisunion.locks import acquire_lock, release_lock
+
 
+# Eskiz tokens are valid for 30 days; refresh a day early.
+ESKIZ_TOKEN_TTL = getattr(settings, 'ESKIZ_TOKEN_TTL', 60 * 60 * 24 * 29)
+ESKIZ_TOKEN_CACHE_KEY = 'eskiz_auth_token'
+ESKIZ_API_URL = getattr(settings, 'ESKIZ_API_URL', 'https://notify.eskiz.uz/api')
+ESKIZ_LOGIN_LOCK_KEY = 'eskiz_auth_token:lock'
+ESKIZ_LOGIN_TIMEOUT = getattr(settings, 'ESKIZ_LOGIN_TIMEOUT', 10)
 
-def get_eskiz_auth_token():
-    url = 'https://notify.eskiz.uz/api/auth/login'
+# Concurrent threads of one process wait on this lock; other processes wait
+# on the cache lock, so a burst of OTP requests logs in at most once.
+eskiz_login_lock = threading.Lock()
+
+
+def eskiz_login():
+    url = f'{ESKIZ_API_URL}/auth/login'
     headers = {'Content-Type': 'application/json'}
     payload = {
         'email': settings.ESKIZ_EMAIL,
         'password': settings.ESKIZ_PASSWORD
     }
 
-    response = requests.post(url, json=payload, headers=headers)
+    response = session.post(url, json=payload, headers=headers)
 
     if response.status_code == 200:
         return response.json()['data']['token']
@@ -19,12 +37,48 @@ def get_eskiz_auth_token():
         return None
 
 
+def get_eskiz_auth_token(rejected_token=None):
+    """
+    Returns the cached Eskiz token, logging in only when there is none.
+
+    :param rejected_token: A token Eskiz answered with 401; it is replaced
+        unless another request already did so.
+    :return: The token, or None if the login failed.
+    """
+    token = cache.get(ESKIZ_TOKEN_CACHE_KEY)
+    if token and token != rejected_token:
+        return token
+
+    with eskiz_login_lock:
+        deadline = time.monotonic() + ESKIZ_LOGIN_TIMEOUT
+        while True:
+            token = cache.get(ESKIZ_TOKEN_CACHE_KEY)
+            if token and token != rejected_token:
+                return token
+            lock_token = acquire_lock(ESKIZ_LOGIN_LOCK_KEY, ESKIZ_LOGIN_TIMEOUT)
+            if lock_token is not None:
+                break
+            if time.monotonic() >= deadline:
+                # The process holding the lock is stuck; log in ourselves.
+                break
+            time.sleep(0.1)
+
+        try:
+            token = eskiz_login()
+            if token:
+                cache.set(ESKIZ_TOKEN_CACHE_KEY, token, timeout=ESKIZ_TOKEN_TTL)
+            return token
+        finally:
+            if lock_token is not None:
+                release_lock(ESKIZ_LOGIN_LOCK_KEY, lock_token)
+
+
 def send_sms_via_eskiz(to_number, message):
     token = get_eskiz_auth_token()
     if token is None:
         return False  # or handle error appropriately
 
-    url = 'https://notify.eskiz.uz/api/message/sms/send'
+    url = f'{ESKIZ_API_URL}/message/sms/send'
     headers = {
         'Authorization': f'Bearer {token}',
         'Content-Type': 'application/json'
@@ -35,7 +89,15 @@ def send_sms_via_eskiz(to_number, message):
         'from': 4546
     }
 
-    response = requests.post(url, json=payload, headers=headers)
+    response = session.post(url, json=payload, headers=headers)
+
+    if response.status_code == 401:
+        # The cached token expired or was revoked; log in again once.
+        token = get_eskiz_auth_token(rejected_token=token)
+        if token is None:
+            return False
+        headers['Authorization'] = f'Bearer {token}'
+        response = session.post(url, json=payload, headers=headers)
 
     if response.status_code == 200:
         return True  # SMS sent successfully
@@ -5,8 +5,8 @@ from django.contrib.auth.models import User
 from rest_framework.exceptions import APIException
 from prison_market.models import PrisonerContact
 from .serializers import PrisonerContactSerializer, PrisonerContactTokenObtainPairSerializer
+from prisoner_contact_auth.otp import discard_code, issue_code, verify_code
 from prisoner_contact_auth.utils import send_sms_via_eskiz
-import random
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from prison_market.utils import standardResponse
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -145,14 +145,13 @@ class PrisonerContactLoginView(views.APIView):
 
     def post(self, request, *args, **kwargs):
         phone_number = request.data.get('phone_number')
-        verification_code = random.randint(1000, 9999)
+        verification_code = issue_code(phone_number)
         message = f"Your login verification code is: {verification_code}"
 
         if send_sms_via_eskiz(phone_number, message):
-            PrisonerContact.objects.filter(phone_number=phone_number).update(
-                phone_verification_code=str(verification_code))
             return standardResponse(status="success", message="Verification code sent", data={})
         else:
+            discard_code(phone_number)
             return standardResponse(status="error", message="Failed to send verification code", data={}, http_status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
@@ -161,33 +160,25 @@ class VerifyPrisonerContactView(views.APIView):
         phone_number = request.data.get('phone_number')
         code = request.data.get('code')
 
-        try:
-            prisoner_contact = PrisonerContact.objects.get(
-                phone_number=phone_number, phone_verification_code=code)
-            prisoner_contact.phone_verified = True
-            prisoner_contact.phone_verification_code = ''
-            prisoner_contact.save()
+        if verify_code(phone_number, code) and PrisonerContact.objects.filter(
+                phone_number=phone_number).update(phone_verified=True):
             return standardResponse(status="success", message="Phone number verified successfully", data={})
-        except PrisonerContact.DoesNotExist:
-            return standardResponse(status="error", message="Invalid phone number or verification code", data={})
+        return standardResponse(status="error", message="Invalid phone number or verification code", data={})
 
 
 class ResendVerificationCodeView(views.APIView):
     def post(self, request, *args, **kwargs):
         phone_number = request.data.get('phone_number')
-        try:
-            prisoner_contact = PrisonerContact.objects.get(
-                phone_number=phone_number)
-            verification_code = random.randint(1000, 9999)
-            prisoner_contact.phone_verification_code = str(verification_code)
-            prisoner_contact.save()
+        if PrisonerContact.objects.filter(phone_number=phone_number).exists():
+            verification_code = issue_code(phone_number)
 
             message = f"Your new verification code is: {verification_code}"
             if send_sms_via_eskiz(phone_number, message):
                 return Response({'status': 'success', 'message': 'Verification code resent successfully.'}, status=status.HTTP_200_OK)
             else:
+                discard_code(phone_number)
                 return Response({'status': 'error', 'message': 'Failed to send verification code.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        except PrisonerContact.DoesNotExist:
+        else:
             return Response({'status': 'error', 'message': 'Prisoner contact not found.'}, status=status.HTTP_404_NOT_FOUND)
 
 
@@ -198,28 +189,22 @@ class RequestLoginCodeView(views.APIView):
         if not phone_number:
             return Response({'status': 'error', 'message': 'Phone number is required.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        verification_code = random.randint(1000, 9999)
+        verification_code = issue_code(phone_number)
         message = f"Your login verification code is: {verification_code}"
 
-        try:
-            prisoner_contact, created = PrisonerContact.objects.get_or_create(
-                phone_number=phone_number,
-                defaults={'phone_verification_code': str(verification_code)}
-            )
-            prisoner_contact.phone_verification_code = str(verification_code)
-            prisoner_contact.save()
+        # The contact is only created once the code is verified.
+        created = not PrisonerContact.objects.filter(phone_number=phone_number).exists()
 
-            if send_sms_via_eskiz(phone_number, message):
-                response_status = status.HTTP_201_CREATED if created else status.HTTP_200_OK
-                return Response({
-                    'status': 'success',
-                    'message': 'Verification code sent.',
-                    'created': created
-                }, status=response_status)
-            else:
-                return Response({'status': 'error', 'message': 'Failed to send verification code.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        except IntegrityError as e:
-            return Response({'status': 'error', 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if send_sms_via_eskiz(phone_number, message):
+            response_status = status.HTTP_201_CREATED if created else status.HTTP_200_OK
+            return Response({
+                'status': 'success',
+                'message': 'Verification code sent.',
+                'created': created
+            }, status=response_status)
+        else:
+            discard_code(phone_number)
+            return Response({'status': 'error', 'message': 'Failed to send verification code.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 class VerifyLoginCodeView(views.APIView):
@@ -231,13 +216,16 @@ class VerifyLoginCodeView(views.APIView):
             # Using standardResponse for error
             return standardResponse(status="error", message="Phone number and code are required.", data={}, http_status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            prisoner_contact = PrisonerContact.objects.get(
-                phone_number=phone_number, phone_verification_code=verification_code)
+        if not verify_code(phone_number, verification_code):
+            # Using standardResponse for error
+            return standardResponse(status="error", message="Invalid phone number or verification code.", data={}, http_status=status.HTTP_404_NOT_FOUND)
 
-            prisoner_contact.phone_verified = True
-            prisoner_contact.phone_verification_code = ''
-            prisoner_contact.save()
+        try:
+            prisoner_contact, created = PrisonerContact.objects.get_or_create(
+                phone_number=phone_number, defaults={'phone_verified': True})
+            if not prisoner_contact.phone_verified:
+                prisoner_contact.phone_verified = True
+                prisoner_contact.save(update_fields=['phone_verified'])
             if not prisoner_contact.user:
                 data = {
                     'refresh': None,
@@ -253,6 +241,5 @@ class VerifyLoginCodeView(views.APIView):
                 }
             # Using standardResponse for success
             return standardResponse(status="success", message="Phone number verified successfully.", data=data)
-        except PrisonerContact.DoesNotExist:
-            # Using standardResponse for error
-            return standardResponse(status="error", message="Invalid phone number or verification code.", data={}, http_status=status.HTTP_404_NOT_FOUND)
+        except IntegrityError as e:
+            return standardResponse(status="error", message=str(e), data={}, http_status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,119 @@
+"""
+Shared outbound HTTP client.
+
+All integrations (bank, Eskiz SMS, OneSignal, Telegram) use ``session`` from
+this module, so connections are kept alive and reused per host instead of
+paying a TCP + TLS handshake on every call. Each request is timed per host;
+``latency_stats()`` returns the counters for the current process.
+"""
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# Number of hosts to keep pools for, and connections kept per host.
+HTTP_POOL_CONNECTIONS = getattr(settings, 'HTTP_POOL_CONNECTIONS', 10)
+HTTP_POOL_MAXSIZE = getattr(settings, 'HTTP_POOL_MAXSIZE', 20)
+# (connect, read) seconds, used when a call does not pass its own timeout.
+HTTP_TIMEOUT = getattr(settings, 'HTTP_TIMEOUT', (3.05, 15))
+# Only failed connects are retried, so a POST is never sent twice.
+HTTP_CONNECT_RETRIES = getattr(settings, 'HTTP_CONNECT_RETRIES', 2)
+HTTP_LATENCY_SAMPLES = getattr(settings, 'HTTP_LATENCY_SAMPLES', 500)
+
+
+class LatencyStats:
+    """
+    Per-host request counters with a window of recent latencies.
+    """
+
+    def __init__(self, samples=HTTP_LATENCY_SAMPLES):
+        self.samples = samples
+        self.lock = threading.Lock()
+        self.hosts = {}
+
+    def record(self, host, seconds, error=False):
+        with self.lock:
+            stats = self.hosts.get(host)
+            if stats is None:
+                stats = self.hosts[host] = {
+                    'count': 0, 'errors': 0, 'total': 0.0, 'max': 0.0,
+                    'recent': deque(maxlen=self.samples),
+                }
+            stats['count'] += 1
+            stats['errors'] += int(error)
+            stats['total'] += seconds
+            stats['max'] = max(stats['max'], seconds)
+            stats['recent'].append(seconds)
+
+    def snapshot(self):
+        """
+        :return: A dict of host -> count, errors and latencies in milliseconds.
+        """
+        with self.lock:
+            hosts = {host: dict(stats, recent=sorted(stats['recent']))
+                     for host, stats in self.hosts.items()}
+
+        def percentile(values, fraction):
+            return round(values[min(int(len(values) * fraction), len(values) - 1)] * 1000, 1)
+
+        return {
+            host: {
+                'count': stats['count'],
+                'errors': stats['errors'],
+                'avg_ms': round(stats['total'] / stats['count'] * 1000, 1),
+                'max_ms': round(stats['max'] * 1000, 1),
+                'p50_ms': percentile(stats['recent'], 0.5),
+                'p95_ms': percentile(stats['recent'], 0.95),
+                'p99_ms': percentile(stats['recent'], 0.99),
+            }
+            for host, stats in hosts.items()
+        }
+
+    def reset(self):
+        with self.lock:
+            self.hosts.clear()
+
+
+stats = LatencyStats()
+
+
+class PooledSession(requests.Session):
+    """
+    A ``requests.Session`` with sized connection pools, a default timeout and
+    per-host latency counters.
+    """
+
+    def __init__(self, pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE):
+        super().__init__()
+        retry = Retry(total=HTTP_CONNECT_RETRIES, connect=HTTP_CONNECT_RETRIES,
+                      read=0, status=0, other=0, backoff_factor=0.1)
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize, max_retries=retry)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault('timeout', HTTP_TIMEOUT)
+        host = urlsplit(url).netloc
+        start = time.perf_counter()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except requests.RequestException:
+            stats.record(host, time.perf_counter() - start, error=True)
+            raise
+        stats.record(host, time.perf_counter() - start,
+                     error=response.status_code >= 500)
+        return response
+
+
+session = PooledSession()
+
+
+def latency_stats():
+    return stats.snapshot()
@@ -0,0 +1,27 @@
+"""
+Cache locks shared by all processes (idempotency keys, token refreshes).
+
+Each holder stores a unique token in the lock and only deletes the lock if it
+still holds that token, so a holder that outlived the lock timeout does not
+release a lock another process has taken since.
+"""
+import uuid
+
+from django.core.cache import cache
+
+
+def acquire_lock(key, timeout):
+    """
+    :return: A token for ``release_lock``, or None if the lock is held.
+    """
+    token = uuid.uuid4().hex
+    if cache.add(key, token, timeout=timeout):
+        return token
+    return None
+
+
+def release_lock(key, token):
+    # The cache API has no compare-and-delete; the window is now only between
+    # these two calls instead of the whole time after the lock expired.
+    if cache.get(key) == token:
+        cache.delete(key)
@@ -17,7 +17,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from prisunion.views import http_stats
+
 urlpatterns = [
+    # Before admin/, whose catch-all view would otherwise 404 it.
+    path('admin/http-stats/', http_stats, name='http-stats'),
     path('admin/', admin.site.urls),
     path('', include('prison_market.urls')),
     path('', include('prison_market_search.urls')),
@@ -0,0 +1,12 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+
+from prisunion.http import latency_stats
+
+
+@staff_member_required
+def http_stats(request):
+    """
+    Outbound request counters per host for the process serving the request.
+    """
+    return JsonResponse(latency_stats())